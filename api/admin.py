@@ -2,4 +2,8 @@ from django.contrib import admin
 from .models import Customer, Loan
 
 admin.site.register(Customer)
-admin.site.register(Loan)
+
+
+@admin.register(Loan)
+class LoanAdmin(admin.ModelAdmin):
+    list_select_related = ['customer']  # Loan.__str__ reads the customer's name
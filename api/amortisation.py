@@ -0,0 +1,83 @@
+import calendar
+import numpy as np
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+from itertools import islice
+from .utils import calculate_monthly_installment
+
+CENT = Decimal('0.01')
+
+
+def add_months(start_date, months):
+    # Same day of the month, clamped to the month's last day
+
+    month_index = start_date.month - 1 + months
+    year = start_date.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(start_date.day, calendar.monthrange(year, month)[1])
+    return date(year, month, day)
+
+
+def iter_amortisation_schedule(loan_amount, interest_rate, tenure, start_date):
+    """Yield the schedule one instalment at a time, so callers only pay for the rows they read"""
+    emi = calculate_monthly_installment(loan_amount, interest_rate, tenure).quantize(CENT, rounding=ROUND_HALF_UP)
+    rate = Decimal(str(interest_rate)) / 100 / 12  # Monthly rate
+    balance = Decimal(str(loan_amount))
+
+    for number in range(1, tenure + 1):
+        interest = (balance * rate).quantize(CENT, rounding=ROUND_HALF_UP)
+        principal = emi - interest
+
+        # The last instalment absorbs rounding so the loan closes at exactly zero
+        if number == tenure or principal > balance:
+            principal = balance
+
+        balance -= principal
+
+        yield {
+            'installment_number': number,
+            'due_date': add_months(start_date, number),
+            'payment': principal + interest,
+            'principal': principal,
+            'interest': interest,
+            'balance': balance,
+        }
+
+        if balance <= 0:
+            return
+
+
+def schedule_page(loan, offset=0, limit=12):
+    """Rows [offset, offset + limit) of a loan's schedule, without building the rows after them"""
+    schedule = iter_amortisation_schedule(loan.loan_amount, loan.interest_rate, loan.tenure, loan.start_date)
+    return list(islice(schedule, offset, offset + limit))
+
+
+def payments_made(start_dates, tenures, as_of):
+    # Whole months elapsed since each start date, the same month arithmetic as Loan.repayments_left
+
+    start_dates = np.asarray(start_dates, dtype='datetime64[M]')
+    as_of_month = np.datetime64(as_of, 'M')
+    months = (as_of_month - start_dates).astype(int)
+    return np.clip(months, 0, np.asarray(tenures))
+
+
+def outstanding_balances(loan_amounts, interest_rates, tenures, payments):
+    """Vectorised outstanding principal after the given number of payments on each loan
+
+    Uses the closed form B_k = P(1+r)^k - EMI((1+r)^k - 1)/r in floating point, so results are
+    meant for portfolio reporting rather than for servicing individual loans.
+    """
+    principal = np.asarray(loan_amounts, dtype=float)
+    rate = np.asarray(interest_rates, dtype=float) / 100 / 12
+    n = np.asarray(tenures, dtype=float)
+    k = np.asarray(payments, dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth_n = (1 + rate) ** n
+        growth_k = (1 + rate) ** k
+        emi = np.where(rate == 0, principal / n, principal * rate * growth_n / (growth_n - 1))
+        balance = np.where(rate == 0, principal - emi * k, principal * growth_k - emi * (growth_k - 1) / rate)
+
+    balance = np.where(k >= n, 0.0, balance)
+    return np.round(np.clip(balance, 0.0, None), 2)
@@ -0,0 +1,70 @@
+import json
+from datetime import date
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import status
+from .models import Customer, Loan
+from .queries import aget_loan_detail_row
+from .routers import areplica_reads
+from .serializers import LOAN_LIST_FIELDS, LoanEligibilitySerializer, eligibility_data, loan_detail_data, loan_list_data
+from .streaming import STREAM_CHUNK_SIZE
+from .utils import CreditEvaluation
+
+# Async twins of the read and eligibility endpoints for ASGI servers. DRF views are sync only,
+# so these are plain Django views: the async ORM does the I/O and the serializers only
+# validate and shape data that is already in memory.
+
+
+@require_GET
+async def view_loan(request, loan_id):
+    """View specific loan details"""
+    async with areplica_reads():
+        row = await aget_loan_detail_row(loan_id)
+    if row is None:
+        return JsonResponse({'detail': 'No Loan matches the given query.'}, status=status.HTTP_404_NOT_FOUND)
+
+    return JsonResponse(loan_detail_data(row, date.today()), status=status.HTTP_200_OK)
+
+
+@require_GET
+async def view_customer_loans(request, customer_id):
+    """View all loans for a customer"""
+    async with areplica_reads(customer_id):
+        if not await Customer.objects.filter(customer_id=customer_id).aexists():
+            return JsonResponse({'error': 'Customer not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        # named=True: Django 5.2's plain tuple iterable would run the query before aiterator() hands it to a thread
+        loans = Loan.objects.filter(customer_id=customer_id, is_active=True).values_list(*LOAN_LIST_FIELDS, named=True)
+        rows = [row async for row in loans.aiterator(chunk_size=STREAM_CHUNK_SIZE)]
+
+    return JsonResponse(loan_list_data(rows, date.today()), safe=False, status=status.HTTP_200_OK)
+
+
+@csrf_exempt
+@require_POST
+async def check_loan_eligibility(request):
+    """Check loan eligibility for a customer"""
+    try:
+        data = json.loads(request.body)
+    except ValueError as exc:
+        return JsonResponse({'detail': f'JSON parse error - {exc}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = LoanEligibilitySerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    customer_id = serializer.validated_data['customer_id']
+
+    async with areplica_reads(customer_id):
+        evaluation = await CreditEvaluation.aload(customer_id)
+    if evaluation is None:
+        return JsonResponse({'error': 'Customer not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    response_data = evaluation.eligibility(
+        serializer.validated_data['loan_amount'],
+        serializer.validated_data['interest_rate'],
+        serializer.validated_data['tenure'],
+    )
+
+    return JsonResponse(eligibility_data(response_data), status=status.HTTP_200_OK)
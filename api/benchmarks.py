@@ -0,0 +1,83 @@
+import statistics
+import time
+from contextlib import ExitStack, contextmanager
+from django.db import connections, transaction
+
+# Timing helpers for the benchmark command. Queries are counted with execute wrappers rather than
+# CaptureQueriesContext, whose log is capped at 9000 entries and would undercount long runs.
+
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile of an already sorted list
+
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def rolled_back():
+    """Run a block in a transaction (or savepoint) that is always rolled back"""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def run_case(call, iterations, warmup=0, rows=1):
+    """Call `call` repeatedly, returning latency percentiles in ms, queries per call and rows/sec"""
+    for _ in range(warmup):
+        call()
+
+    counter = QueryCounter()
+    latencies = []
+
+    with ExitStack() as stack:
+        # Replica reads go through their own connections, so count every alias
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(counter))
+
+        for _ in range(iterations):
+            started = time.perf_counter()
+            call()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    latencies.sort()
+    total_seconds = sum(latencies) / 1000
+
+    return {
+        'iterations': iterations,
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'queries': round(counter.count / iterations, 2),
+        'rows_per_sec': round(rows * iterations / total_seconds, 1) if total_seconds else None,
+    }
+
+
+def regressions(results, baseline, max_regression):
+    """Describe cases whose p95 grew by more than max_regression, or that now run more queries"""
+    previous = {result['name']: result for result in baseline['results']}
+    found = []
+
+    for result in results:
+        before = previous.get(result['name'])
+        if before is None:
+            continue
+
+        if result['p95_ms'] > before['p95_ms'] * (1 + max_regression):
+            found.append(f"{result['name']}: p95 {before['p95_ms']:.2f} ms -> {result['p95_ms']:.2f} ms")
+        if result['queries'] > before['queries']:
+            found.append(f"{result['name']}: {before['queries']:g} -> {result['queries']:g} queries per call")
+
+    return found
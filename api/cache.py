@@ -0,0 +1,86 @@
+import logging
+from datetime import datetime
+from django.conf import settings
+from django.core.cache import cache
+from .metrics import CREDIT_SCORE_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = 'credit_score:generation'
+
+
+def version_key(customer_id):
+    return f'credit_score:version:{customer_id}'
+
+
+def score_key(generation, customer_id, version, year):
+    return f'credit_score:{generation}:{customer_id}:{version}:{year}'
+
+
+def seconds_until_year_end(now):
+    # Scores include a current-year component, so no entry may outlive the year
+
+    return int((datetime(now.year + 1, 1, 1) - now).total_seconds())
+
+
+def increment(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def get_or_compute_credit_score(customer_id, compute):
+    """Return the cached score for a customer, computing and storing it on a miss"""
+    if not settings.CREDIT_SCORE_CACHE_ENABLED:
+        return compute(customer_id)
+
+    now = datetime.now()
+
+    try:
+        versions = cache.get_many([GENERATION_KEY, version_key(customer_id)])
+        key = score_key(versions.get(GENERATION_KEY, 0), customer_id, versions.get(version_key(customer_id), 0), now.year)
+        score = cache.get(key)
+
+        if score is not None:
+            CREDIT_SCORE_CACHE_LOOKUPS.labels('hit').inc()
+            return score
+
+    except Exception:
+        # A cache outage must never block scoring
+        logger.warning("Credit score cache unavailable", exc_info=True)
+        CREDIT_SCORE_CACHE_LOOKUPS.labels('unavailable').inc()
+        return compute(customer_id)
+
+    CREDIT_SCORE_CACHE_LOOKUPS.labels('miss').inc()
+    score = compute(customer_id)
+
+    try:
+        cache.set(key, score, timeout=min(settings.CREDIT_SCORE_CACHE_TTL, seconds_until_year_end(now)))
+    except Exception:
+        logger.warning("Credit score cache unavailable", exc_info=True)
+
+    return score
+
+
+def invalidate_credit_score(customer_id):
+    """Bump a customer's loan version so their cached score is no longer read"""
+    if not settings.CREDIT_SCORE_CACHE_ENABLED:
+        return
+
+    try:
+        increment(version_key(customer_id))
+    except Exception:
+        logger.warning("Credit score cache unavailable", exc_info=True)
+
+
+def invalidate_all_credit_scores():
+    """Bump the global generation, e.g. after a bulk import rewrites loan history"""
+    if not settings.CREDIT_SCORE_CACHE_ENABLED:
+        return
+
+    try:
+        increment(GENERATION_KEY)
+    except Exception:
+        logger.warning("Credit score cache unavailable", exc_info=True)
+
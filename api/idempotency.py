@@ -0,0 +1,80 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+def request_hash(data):
+    # Stable digest of the request body, so a reused key with a different body can be rejected
+
+    body = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def stored_response(endpoint, key, digest):
+    """Replay the response saved for a key, or None if the key is unused or has expired"""
+    cutoff = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    IdempotencyKey.objects.filter(endpoint=endpoint, key=key, created_at__lt=cutoff).delete()
+
+    record = IdempotencyKey.objects.filter(endpoint=endpoint, key=key).first()
+    if record is None:
+        return None
+
+    if record.request_hash != digest:
+        return Response({'error': f'{IDEMPOTENCY_HEADER} was already used with a different request'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    return Response(record.response_body, status=record.response_status, headers={REPLAYED_HEADER: 'true'})
+
+
+def idempotent(view):
+    """Let clients retry a POST safely by sending an Idempotency-Key header
+
+    The key row is inserted in the same transaction as the view's writes; if a concurrent request
+    with the same key commits first, the unique index rolls this one back and its response is replayed.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        endpoint = view.__name__
+        digest = request_hash(request.data)
+
+        replay = stored_response(endpoint, key, digest)
+        if replay is not None:
+            return replay
+
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey(endpoint=endpoint, key=key, request_hash=digest)
+                response = view(request, *args, **kwargs)
+
+                record.response_status = response.status_code
+                record.response_body = response.data
+                record.save()
+        except IntegrityError:
+            # Another request with this key committed first
+            replay = stored_response(endpoint, key, digest)
+            if replay is None:
+                raise
+            return replay
+
+        return response
+
+    return wrapper
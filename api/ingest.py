@@ -0,0 +1,411 @@
+import csv
+import io
+import json
+import os
+import time
+import pandas as pd
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from itertools import islice
+from openpyxl import load_workbook
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from .models import Customer, ImportCheckpoint, Loan
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_WORKERS = 4
+DEFAULT_SHARD_SIZE = 50000
+
+CUSTOMER_COLUMNS = {
+    'Customer ID': 'customer_id',
+    'First Name': 'first_name',
+    'Last Name': 'last_name',
+    'Age': 'age',
+    'Phone Number': 'phone_number',
+    'Monthly Salary': 'monthly_salary',
+    'Approved Limit': 'approved_limit',
+    'Current Debt': 'current_debt',
+}
+
+LOAN_COLUMNS = {
+    'Customer ID': 'customer_id',
+    'Loan ID': 'loan_id',
+    'Loan Amount': 'loan_amount',
+    'Tenure': 'tenure',
+    'Interest Rate': 'interest_rate',
+    'Monthly payment': 'monthly_repayment',
+    'EMIs paid on Time': 'emis_paid_on_time',
+    'Date of Approval': 'start_date',
+    'End Date': 'end_date',
+}
+
+
+def prepare_customers(df):
+    """Convert a customer sheet to model columns with vectorised pandas operations"""
+    frame = df.rename(columns=CUSTOMER_COLUMNS)
+
+    if 'current_debt' not in frame:
+        frame['current_debt'] = 0
+
+    # COPY skips Django's field defaults, so every NOT NULL column needs a value in the frame;
+    # active_emi_total is filled in from the loans by rebuild_credit_stats after the import
+    frame = frame[list(CUSTOMER_COLUMNS.values())].assign(active_emi_total=0)
+    frame = frame.drop_duplicates(subset='customer_id', keep='first')
+
+    for column in ('customer_id', 'age', 'phone_number'):
+        frame[column] = pd.to_numeric(frame[column]).astype('int64')
+    for column in ('monthly_salary', 'approved_limit', 'current_debt'):
+        frame[column] = pd.to_numeric(frame[column]).fillna(0).round(2)
+    for column in ('first_name', 'last_name'):
+        frame[column] = frame[column].astype(str)
+
+    return frame
+
+
+def prepare_loans(df, today=None):
+    """Convert a loan sheet to model columns with vectorised pandas operations"""
+    today = today or datetime.now().date()
+    frame = df.rename(columns=LOAN_COLUMNS)[list(LOAN_COLUMNS.values())]
+    frame = frame.drop_duplicates(subset='loan_id', keep='first')
+
+    for column in ('customer_id', 'loan_id', 'tenure', 'emis_paid_on_time'):
+        frame[column] = pd.to_numeric(frame[column]).astype('int64')
+    for column in ('loan_amount', 'interest_rate', 'monthly_repayment'):
+        frame[column] = pd.to_numeric(frame[column]).round(2)
+    for column in ('start_date', 'end_date'):
+        frame[column] = pd.to_datetime(frame[column]).dt.date
+
+    frame['is_active'] = frame['end_date'] >= today
+    return frame
+
+
+def existing_ids(model, field, ids):
+    """Fetch the ids already stored for a model, using one range query over the candidate ids"""
+    if len(ids) == 0:
+        return set()
+
+    lookup = {f'{field}__gte': int(ids.min()), f'{field}__lte': int(ids.max())}
+    return set(model.objects.filter(**lookup).values_list(field, flat=True))
+
+
+def timestamped(frame):
+    """Add the auto_now_add/auto_now timestamps that COPY does not fill in"""
+    now = timezone.now()
+    return frame.assign(created_at=now, updated_at=now)
+
+
+def copy_frame(model, frame):
+    """Stream a frame into the model's table with PostgreSQL COPY"""
+    frame = timestamped(frame)
+    columns = [model._meta.get_field(name).column for name in frame.columns]
+
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False, header=False, quoting=csv.QUOTE_MINIMAL)
+    buffer.seek(0)
+
+    sql = f"COPY {model._meta.db_table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+
+    with connection.cursor() as cursor:
+        # psycopg 3 (needed for the connection pool) streams through cursor.copy(); psycopg2 uses copy_expert()
+        if hasattr(cursor.cursor, 'copy'):
+            with cursor.cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+        else:
+            cursor.copy_expert(sql, buffer)
+
+
+def insert_ignoring_conflicts(model, objects, batch_size=DEFAULT_BATCH_SIZE):
+    """bulk_create(ignore_conflicts=True) that returns the number of rows actually inserted
+
+    Rows another shard or worker stored after the existing_ids() check are skipped by the
+    database without bulk_create reporting them, so count the rows in the batch's id range
+    before and after, with the same range query as existing_ids().
+    """
+    if not objects:
+        return 0
+
+    pks = [obj.pk for obj in objects]
+    ids = model.objects.filter(pk__gte=min(pks), pk__lte=max(pks))
+
+    with transaction.atomic(savepoint=False):
+        before = ids.count()
+        model.objects.bulk_create(objects, batch_size=batch_size, ignore_conflicts=True)
+        return ids.count() - before
+
+
+def write_frame(model, frame, batch_size=DEFAULT_BATCH_SIZE, use_copy=False):
+    """Insert a prepared frame, returning the number of rows inserted
+
+    Uses COPY on PostgreSQL when requested, which fails on a conflicting id rather than skipping it,
+    or batched INSERTs that skip rows already stored otherwise.
+    """
+    if frame.empty:
+        return 0
+
+    if use_copy and connection.vendor == 'postgresql':
+        copy_frame(model, frame)
+        return len(frame)
+
+    objects = [model(**record) for record in frame.to_dict('records')]
+    return insert_ignoring_conflicts(model, objects, batch_size)
+
+
+def bulk_load_customers(df, batch_size=DEFAULT_BATCH_SIZE, use_copy=False, skipped=None):
+    """Insert customers that are not stored yet, returning the number created
+
+    Pass a Counter as `skipped` to count the rows left out, by reason.
+    """
+    frame = prepare_customers(df)
+    is_new = ~frame['customer_id'].isin(existing_ids(Customer, 'customer_id', frame['customer_id']))
+
+    if skipped is not None:
+        skipped['duplicate'] += len(df) - len(frame)
+        skipped['exists'] += int((~is_new).sum())
+
+    created = write_frame(Customer, frame[is_new], batch_size, use_copy)
+
+    if skipped is not None:
+        # Stored by a concurrent writer between the existing_ids() check and the insert
+        skipped['exists'] += int(is_new.sum()) - created
+
+    return created
+
+
+def bulk_load_loans(df, batch_size=DEFAULT_BATCH_SIZE, use_copy=False, skipped=None):
+    """Insert loans that are not stored yet and whose customer exists, returning the number created
+
+    Pass a Counter as `skipped` to count the rows left out, by reason.
+    """
+    frame = prepare_loans(df)
+    is_new = ~frame['loan_id'].isin(existing_ids(Loan, 'loan_id', frame['loan_id']))
+    has_customer = frame['customer_id'].isin(existing_ids(Customer, 'customer_id', frame['customer_id']))
+
+    if skipped is not None:
+        skipped['duplicate'] += len(df) - len(frame)
+        skipped['exists'] += int((~is_new).sum())
+        skipped['missing_customer'] += int((is_new & ~has_customer).sum())
+
+    created = write_frame(Loan, frame[is_new & has_customer], batch_size, use_copy)
+
+    if skipped is not None:
+        # Stored by a concurrent writer between the existing_ids() check and the insert
+        skipped['exists'] += int((is_new & has_customer).sum()) - created
+
+    return created
+
+
+def rows_per_second(rows, started):
+    # Throughput since `started` (a time.perf_counter() reading)
+
+    elapsed = time.perf_counter() - started
+    return rows / elapsed if elapsed > 0 else float(rows)
+
+
+def iter_excel_chunks(file_path, chunk_size, skip_rows=0):
+    # openpyxl read-only mode streams rows from the sheet XML instead of loading the workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows)
+        rows = (row for row in rows if any(cell is not None for cell in row))
+        rows = islice(rows, skip_rows, None)
+
+        while chunk := list(islice(rows, chunk_size)):
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        workbook.close()
+
+
+def iter_csv_chunks(file_path, chunk_size, skip_rows=0):
+    yield from pd.read_csv(file_path, chunksize=chunk_size, skiprows=range(1, skip_rows + 1))
+
+
+def iter_jsonl_chunks(file_path, chunk_size, skip_rows=0):
+    with open(file_path) as f:
+        lines = islice((line for line in f if line.strip()), skip_rows, None)
+
+        while chunk := list(islice(lines, chunk_size)):
+            yield pd.DataFrame([json.loads(line) for line in chunk])
+
+
+CHUNK_READERS = {
+    '.xlsx': iter_excel_chunks,
+    '.csv': iter_csv_chunks,
+    '.jsonl': iter_jsonl_chunks,
+}
+
+BULK_LOADERS = {
+    'customers': bulk_load_customers,
+    'loans': bulk_load_loans,
+}
+
+SOURCE_ID_COLUMNS = {
+    'customers': 'Customer ID',
+    'loans': 'Loan ID',
+}
+
+
+def iter_chunks(file_path, chunk_size=DEFAULT_CHUNK_SIZE, skip_rows=0):
+    """Yield DataFrames of at most chunk_size data rows from an xlsx, csv or jsonl file"""
+    extension = os.path.splitext(file_path)[1].lower()
+
+    if extension not in CHUNK_READERS:
+        raise ValueError(f"Unsupported file type: {extension}")
+
+    return CHUNK_READERS[extension](file_path, chunk_size, skip_rows)
+
+
+def count_rows(file_path):
+    """Count the data rows of a file without loading it"""
+    if os.path.splitext(file_path)[1].lower() == '.xlsx':
+        workbook = load_workbook(file_path, read_only=True)
+        try:
+            return max(0, (workbook.active.max_row or 1) - 1)
+        finally:
+            workbook.close()
+
+    return sum(len(chunk) for chunk in iter_chunks(file_path))
+
+
+def write_shards(file_path, directory, prefix, shard_size=DEFAULT_SHARD_SIZE, id_column=None):
+    """Split a file into CSV shards of at most shard_size rows, returning (path, start, stop) per shard
+
+    The source is parsed once; each worker then reads only its own shard instead of
+    re-reading the source from the top to reach its rows. With id_column, an id is only written
+    to the shard holding its first occurrence, so no two shards insert the same row (which COPY
+    cannot skip); stop - start still counts the source rows, including those left out.
+    """
+    shards = []
+    start = 0
+    seen = set()
+
+    for index, chunk in enumerate(iter_chunks(file_path, shard_size)):
+        rows = len(chunk)
+        if id_column:
+            chunk = chunk.drop_duplicates(subset=id_column, keep='first')
+            chunk = chunk[~chunk[id_column].isin(seen)]
+            seen.update(chunk[id_column].tolist())
+
+        path = os.path.join(directory, f'{prefix}-{index:05d}.csv')
+        chunk.to_csv(path, index=False)
+        shards.append((path, start, start + rows))
+        start += rows
+
+    return shards
+
+
+def reset_sequences():
+    """Move the customer and loan id sequences past the highest loaded id (PostgreSQL only)"""
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT setval(pg_get_serial_sequence('customer', 'customer_id'), COALESCE((SELECT MAX(customer_id) FROM customer), 0) + 1, false);")
+        cursor.execute("SELECT setval(pg_get_serial_sequence('loan', 'loan_id'), COALESCE((SELECT MAX(loan_id) FROM loan), 0) + 1, false);")
+
+
+def write_chunk(loader, chunk, batch_size, use_copy, threaded):
+    # Each chunk commits on its own so the checkpoint can advance past it.
+    # Returns the rows created, the rows skipped by reason and the seconds to write and commit.
+
+    skipped = Counter()
+    started = time.perf_counter()
+    try:
+        with transaction.atomic():
+            created = loader(chunk, batch_size=batch_size, use_copy=use_copy, skipped=skipped)
+        return created, skipped, time.perf_counter() - started
+    finally:
+        if threaded:
+            connections.close_all()
+
+
+def stream_load(kind, file_path, chunk_size=DEFAULT_CHUNK_SIZE, workers=DEFAULT_WORKERS,
+                resume=True, batch_size=DEFAULT_BATCH_SIZE, use_copy=False, progress=None):
+    """Load a customer or loan file chunk by chunk with bounded memory and a resumable checkpoint
+
+    With several workers, an id repeated across chunks keeps whichever row commits first
+    rather than the first row in the file. Each committed chunk is reported to `progress`
+    (an api.progress.ImportProgress) when one is given. SQLite allows one writer at a time,
+    so there chunks are always written one after another.
+    """
+    loader = BULK_LOADERS[kind]
+    if connection.vendor == 'sqlite':
+        workers = 1
+    checkpoint, _ = ImportCheckpoint.objects.get_or_create(source=f"{kind}:{os.path.abspath(file_path)}")
+    start_row = checkpoint.last_row if resume else 0
+
+    if progress is not None and progress.total_rows is None:
+        # Rows still to load, for the ETA
+        progress.total_rows = max(0, count_rows(file_path) - start_row)
+
+    # Chunks may finish out of order, so the checkpoint only advances over a contiguous prefix
+    finished = {}
+    committed_row = start_row
+    created_count = 0
+    skipped = Counter()
+    rows_read = 0
+
+    def save_checkpoint():
+        ImportCheckpoint.objects.filter(pk=checkpoint.pk).update(last_row=committed_row, updated_at=timezone.now())
+
+    def record(chunk_rows, result):
+        nonlocal created_count
+        created, chunk_skipped, seconds = result
+        created_count += created
+        skipped.update(chunk_skipped)
+        if progress is not None:
+            progress.batch(chunk_rows, created, seconds, chunk_skipped)
+
+    def advance(future):
+        nonlocal committed_row
+        chunk_start, chunk_rows = in_flight.pop(future)
+        record(chunk_rows, future.result())
+        finished[chunk_start] = chunk_rows
+
+        while committed_row in finished:
+            committed_row += finished.pop(committed_row)
+
+        save_checkpoint()
+
+    started = time.perf_counter()
+    in_flight = {}
+    threaded = workers > 1
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for chunk in iter_chunks(file_path, chunk_size, skip_rows=start_row):
+            chunk_start = start_row + rows_read
+            rows_read += len(chunk)
+
+            if not threaded:
+                record(len(chunk), write_chunk(loader, chunk, batch_size, use_copy, threaded))
+                committed_row = start_row + rows_read
+                save_checkpoint()
+                continue
+
+            # Keep at most two chunks per worker in memory
+            if len(in_flight) >= workers * 2:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    advance(future)
+
+            future = executor.submit(write_chunk, loader, chunk, batch_size, use_copy, threaded)
+            in_flight[future] = (chunk_start, len(chunk))
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                advance(future)
+
+    # A completed import starts from the top next time
+    checkpoint.delete()
+
+    return {
+        'rows': rows_read,
+        'created': created_count,
+        'skipped': dict(skipped),
+        'resumed_from': start_row,
+        'rows_per_sec': rows_per_second(rows_read, started),
+    }
@@ -0,0 +1,184 @@
+import json
+import random
+from contextlib import contextmanager, nullcontext
+from decimal import Decimal
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max, Min
+from django.test import Client
+from api.benchmarks import regressions, rolled_back, run_case
+from api.ingest import count_rows
+from api.models import Customer, Loan
+from api.tasks import DATA_FILES, load_customer_data, load_loan_data
+from api.utils import calculate_credit_score, calculate_monthly_installment, check_emi_constraint, compute_credit_score
+
+SAMPLE_SIZE = 1000
+
+class Command(BaseCommand):
+    help = 'Time the credit checks, every API endpoint and the Excel loaders against the current database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--heavy-iterations', type=int, default=3,
+                            help='Iterations for the portfolio export and the Excel loaders')
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--only', default='', help='Comma separated case names to run')
+        parser.add_argument('--output', default=None, help='Write the results to this JSON file')
+        parser.add_argument('--baseline', default=None,
+                            help='Fail if a case is slower at p95, or runs more queries, than in this JSON file')
+        parser.add_argument('--max-regression', type=float, default=0.25,
+                            help='Allowed p95 growth over the baseline, as a fraction')
+
+    def sample_ids(self, model, field):
+        # Random existing ids without ORDER BY RANDOM(), which sorts the whole table
+
+        bounds = model.objects.aggregate(low=Min(field), high=Max(field))
+        if bounds['low'] is None:
+            raise CommandError(f"No {model._meta.db_table} rows; run generate_synthetic_data first")
+
+        candidates = [self.rng.randint(bounds['low'], bounds['high']) for _ in range(SAMPLE_SIZE * 2)]
+        ids = list(model.objects.filter(**{f'{field}__in': candidates}).values_list(field, flat=True)[:SAMPLE_SIZE])
+        if len(ids) < SAMPLE_SIZE:
+            ids += model.objects.values_list(field, flat=True)[:SAMPLE_SIZE - len(ids)]
+        return ids
+
+    def customer(self):
+        return self.rng.choice(self.customer_ids)
+
+    def loan(self):
+        return self.rng.choice(self.loan_ids)
+
+    def loan_request(self):
+        return {
+            'customer_id': self.customer(),
+            'loan_amount': self.rng.choice([50000, 200000, 500000, 1000000]),
+            'interest_rate': self.rng.choice([8.5, 12, 14.5, 18]),
+            'tenure': self.rng.choice([12, 24, 36, 60]),
+        }
+
+    def get(self, path, **params):
+        response = self.client.get(path, params)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def post(self, path, data, write=False):
+        # Writes are rolled back so every iteration sees the same data
+        with rolled_back() if write else nullcontext():
+            return self.client.post(path, data, content_type='application/json')
+
+    @contextmanager
+    def staff_session(self):
+        # A throwaway staff user for the admin export, rolled back together with its session
+        with rolled_back():
+            self.client.force_login(User.objects.create(username='benchmark-staff', is_staff=True))
+            yield
+            self.client.logout()
+
+    @contextmanager
+    def without_sample_data(self, customers=False):
+        # The loaders skip ids that are already stored, so time them against a database without the sample sheets
+
+        sheets = {kind: pd.read_excel(path) for kind, path in DATA_FILES.items()}
+        with rolled_back():
+            Loan.objects.filter(loan_id__in=sheets['loans']['Loan ID'].tolist()).delete()
+            Customer.objects.filter(customer_id__in=sheets['customers']['Customer ID'].tolist()).delete()
+            if customers:
+                load_customer_data()
+            yield
+
+    def load(self, loader):
+        with rolled_back():
+            result = loader()
+        if not result.startswith('Successfully'):
+            raise CommandError(result)
+
+    def cases(self):
+        amounts = [Decimal(amount) for amount in ('50000', '125000', '300000', '750000', '1500000')]
+        export_rows = Loan.objects.count()
+
+        yield 'calculate_credit_score', lambda: calculate_credit_score(self.customer()), 1, False, None
+        yield 'compute_credit_score', lambda: compute_credit_score(self.customer()), 1, False, None
+        yield 'check_emi_constraint', lambda: check_emi_constraint(self.customer(), Decimal('15000')), 1, False, None
+        yield 'calculate_monthly_installment', lambda: calculate_monthly_installment(
+            self.rng.choice(amounts), self.rng.choice([Decimal('8.5'), Decimal('14.25')]), self.rng.choice([12, 36, 60]),
+        ), 1, False, None
+
+        yield 'register', lambda: self.post('/api/register/', {
+            'first_name': 'Bench', 'last_name': 'Mark', 'age': 30,
+            'monthly_income': self.rng.choice([25000, 60000, 150000]), 'phone_number': 9999999999,
+        }, write=True), 1, False, None
+        yield 'check_eligibility', lambda: self.post('/api/check-eligibility/', self.loan_request()), 1, False, None
+        yield 'create_loan', lambda: self.post('/api/create-loan/', self.loan_request(), write=True), 1, False, None
+        yield 'view_loans', lambda: self.get('/api/loans/', ids=','.join(
+            str(loan_id) for loan_id in self.rng.sample(self.loan_ids, 50))), 50, False, None
+        yield 'view_loan', lambda: self.get(f'/api/view-loan/{self.loan()}/'), 1, False, None
+        yield 'view_loan_schedule', lambda: self.get(f'/api/view-loan/{self.loan()}/schedule/'), 1, False, None
+        yield 'view_customer_loans', lambda: self.get(f'/api/view-loans/{self.customer()}/'), 1, False, None
+        yield 'loan_quotes', lambda: self.post('/api/loan-quotes/', {
+            'customer_id': self.customer(), 'loan_amounts': [str(amount) for amount in amounts],
+            'interest_rates': ['8.5', '12', '14.5', '18'], 'tenures': [12, 36, 60],
+        }), 60, False, None
+        yield 'batch_credit_scores', lambda: self.post('/api/credit-scores/batch/', {
+            'customer_ids': self.rng.sample(self.customer_ids, 100),
+        }), 100, False, None
+        yield 'export_portfolio', lambda: self.get('/api/admin/portfolio-export/'), export_rows, True, self.staff_session
+        yield 'async_check_eligibility', lambda: self.post('/api/async/check-eligibility/', self.loan_request()), 1, False, None
+        yield 'async_view_loan', lambda: self.get(f'/api/async/view-loan/{self.loan()}/'), 1, False, None
+        yield 'async_view_customer_loans', lambda: self.get(f'/api/async/view-loans/{self.customer()}/'), 1, False, None
+
+        yield 'load_customer_data', lambda: self.load(load_customer_data), count_rows(DATA_FILES['customers']), True, \
+            self.without_sample_data
+        yield 'load_loan_data', lambda: self.load(load_loan_data), count_rows(DATA_FILES['loans']), True, \
+            lambda: self.without_sample_data(customers=True)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.client = Client()
+        self.customer_ids = self.sample_ids(Customer, 'customer_id')
+        self.loan_ids = self.sample_ids(Loan, 'loan_id')
+        only = {name.strip() for name in options['only'].split(',') if name.strip()}
+
+        self.stdout.write(f"{'case':<30}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'rows/s':>12}")
+        results = []
+
+        for name, call, rows, heavy, setup in self.cases():
+            if only and name not in only:
+                continue
+
+            # Heavy cases walk whole tables, so they run a few times without warmup
+            iterations = options['heavy_iterations'] if heavy else options['iterations']
+            warmup = 0 if heavy else options['warmup']
+
+            # Each case draws its own inputs, so --only and new cases do not change the others' requests
+            self.rng = random.Random(f"{options['seed']}:{name}")
+
+            with setup() if setup else nullcontext():
+                result = {'name': name, **run_case(call, iterations, warmup=warmup, rows=rows)}
+
+            results.append(result)
+            self.stdout.write(
+                f"{name:<30}{result['iterations']:>6}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+                f"{result['p99_ms']:>10.2f}{result['queries']:>9g}{result['rows_per_sec'] or 0:>12.0f}"
+            )
+
+        report = {
+            'database': connection.vendor,
+            'customers': Customer.objects.count(),
+            'loans': Loan.objects.count(),
+            'results': results,
+        }
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                found = regressions(results, json.load(file), options['max_regression'])
+            if found:
+                raise CommandError("Regressions against the baseline:\n  " + "\n  ".join(found))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
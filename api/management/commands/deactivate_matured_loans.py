@@ -0,0 +1,18 @@
+from datetime import date
+from django.core.management.base import BaseCommand
+from api.scoring import SWEEP_BATCH_SIZE, sweep_matured_loans
+
+class Command(BaseCommand):
+    help = 'Deactivate loans past their end date, in batches (the same sweep the nightly beat task runs)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--as-of', type=date.fromisoformat, default=None,
+                            help='Deactivate loans that ended before this date (YYYY-MM-DD), defaults to today')
+        parser.add_argument('--batch-size', type=int, default=SWEEP_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        result = sweep_matured_loans(as_of=options['as_of'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Deactivated {result['loans']} loans in {result['batches']} batches "
+            f"for {result['customers']} customers"
+        ))
@@ -0,0 +1,53 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from api.models import Customer, Loan
+from api.scoring import credit_aggregate_annotations, credit_stats_queryset, current_year_lookup
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN (ANALYZE on PostgreSQL) for each hot-path query, for index regression checks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customer-id', type=int, default=None,
+                            help='Customer to plan for, defaults to the one with the most loans')
+        parser.add_argument('--fail-on-seq-scan', action='store_true',
+                            help='Exit with an error if any plan sequentially scans the loan table')
+
+    def hot_queries(self, customer_id, loan_id):
+        year = datetime.now().year
+        annotations = credit_aggregate_annotations(year)
+
+        return {
+            'credit_aggregates': Customer.objects.filter(customer_id=customer_id).annotate(**annotations).values('customer_id', *annotations),
+            'credit_stats': credit_stats_queryset(year).filter(customer_id=customer_id),
+            'active_loans': Loan.objects.filter(customer_id=customer_id, is_active=True).values('loan_amount', 'monthly_repayment'),
+            'current_year_loans': Loan.objects.filter(customer_id=customer_id, **current_year_lookup('start_date', year)),
+            'customer_loans': Loan.objects.filter(customer_id=customer_id, is_active=True),
+            'loan_detail': Loan.objects.select_related('customer').filter(loan_id=loan_id),
+        }
+
+    def handle(self, *args, **options):
+        customer_id = options['customer_id']
+        if customer_id is None:
+            busiest = Loan.objects.values('customer_id').annotate(loans=Count('loan_id')).order_by('-loans').first()
+            if busiest is None:
+                raise CommandError("No loans to plan against")
+            customer_id = busiest['customer_id']
+
+        loan_id = Loan.objects.filter(customer_id=customer_id).values_list('loan_id', flat=True).first()
+        analyze = connection.vendor == 'postgresql'
+        seq_scans = []
+
+        for name, queryset in self.hot_queries(customer_id, loan_id).items():
+            plan = queryset.explain(analyze=True, buffers=True) if analyze else queryset.explain()
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== {name}"))
+            self.stdout.write(plan)
+            self.stdout.write("")
+
+            if 'Seq Scan on loan' in plan or 'SCAN loan' in plan:
+                seq_scans.append(name)
+
+        if seq_scans and options['fail_on_seq_scan']:
+            raise CommandError(f"Sequential scan on loan in: {', '.join(seq_scans)}")
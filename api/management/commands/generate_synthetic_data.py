@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from api.synthetic import SYNTHETIC_CHUNK_SIZE, generate_synthetic_data
+
+class Command(BaseCommand):
+    help = 'Insert seeded synthetic customers and loans (10k to 10M loans) for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loans', type=int, default=10000)
+        parser.add_argument('--customers', type=int, default=None,
+                            help='Defaults to one customer per five loans')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--chunk-size', type=int, default=SYNTHETIC_CHUNK_SIZE)
+        parser.add_argument('--no-copy', action='store_true',
+                            help='Use bulk_create instead of COPY on PostgreSQL')
+
+    def progress(self, kind, done, total):
+        self.stdout.write(f"  {kind}: {done}/{total}")
+
+    def handle(self, *args, **options):
+        result = generate_synthetic_data(
+            options['loans'],
+            customers=options['customers'],
+            seed=options['seed'],
+            chunk_size=options['chunk_size'],
+            use_copy=not options['no_copy'],
+            progress=self.progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {result['customers']} customers from id {result['first_customer_id']} "
+            f"and {result['loans']} loans from id {result['first_loan_id']}"
+        ))
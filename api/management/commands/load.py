@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from api.ingest import reset_sequences
+from api.models import Customer
+from api.tasks import load_customer_data, load_loan_data
+
+class Command(BaseCommand):
+    help = 'Load Excel data automatically'
+
+    def handle(self, *args, **options):
+        self.stdout.write("Loading Excel data...")
+
+        # Check if data exists
+        if Customer.objects.count() == 0:
+            self.stdout.write("Loading data from Excel files...")
+
+            # Load data
+            result1 = load_customer_data(use_copy=True)
+            self.stdout.write(f"Customers: {result1}")
+
+            result2 = load_loan_data(use_copy=True)
+            self.stdout.write(f"Loans: {result2}")
+
+            # Fix sequences
+            reset_sequences()
+
+            self.stdout.write("Data loaded successfully!")
+        else:
+            self.stdout.write("Data already exists")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from api.models import Customer
+from api.scoring import BULK_CHUNK_SIZE, recompute_customer_debt
+
+class Command(BaseCommand):
+    help = 'Recompute customer current_debt and active_emi_total from active loans, e.g. after an import'
+
+    def handle(self, *args, **options):
+        updated = 0
+        last_id = 0
+
+        # One UPDATE per chunk of customers keeps each statement's locks short
+        while chunk := list(
+            Customer.objects.filter(customer_id__gt=last_id)
+            .order_by('customer_id')
+            .values_list('customer_id', flat=True)[:BULK_CHUNK_SIZE]
+        ):
+            updated += recompute_customer_debt(chunk)
+            last_id = chunk[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Recomputed debt for {updated} customers"))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from api.ingest import DEFAULT_CHUNK_SIZE, iter_chunks
+from api.registration import register_customers
+from api.serializers import CustomerRegistrationSerializer
+
+class Command(BaseCommand):
+    help = 'Register customers from an xlsx, csv or jsonl file with the /api/register/ fields, e.g. an employer cohort'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file_path')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        created = rejected = rows = 0
+
+        for chunk in iter_chunks(options['file_path'], options['chunk_size']):
+            records = chunk.astype(object).where(chunk.notna(), None).to_dict('records')
+            serializer = CustomerRegistrationSerializer(data=records, many=True)
+
+            if not serializer.is_valid():
+                # Report the bad rows (numbered from 1, after the header) and register the rest
+                valid = []
+                for index, (record, errors) in enumerate(zip(records, serializer.errors), start=rows + 1):
+                    if errors:
+                        reasons = '; '.join(f"{field}: {' '.join(messages)}" for field, messages in errors.items())
+                        self.stderr.write(f"Row {index}: {reasons}")
+                    else:
+                        valid.append(record)
+
+                rejected += len(records) - len(valid)
+                serializer = CustomerRegistrationSerializer(data=valid, many=True)
+                serializer.is_valid(raise_exception=True)
+
+            if serializer.validated_data:
+                created += len(register_customers(serializer.validated_data, batch_size=options['chunk_size']))
+            rows += len(records)
+
+        self.stdout.write(self.style.SUCCESS(f"Registered {created} customers, rejected {rejected} rows"))
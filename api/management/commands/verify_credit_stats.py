@@ -0,0 +1,46 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand
+from api.models import Customer
+from api.scoring import BULK_CHUNK_SIZE, CREDIT_FIELDS, credit_stats_queryset, get_credit_aggregates_bulk, rebuild_credit_stats
+
+class Command(BaseCommand):
+    help = 'Verify customer_credit_stats and customer debt columns against the raw loan rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Rebuild rows that are missing or out of date')
+
+    def handle(self, *args, **options):
+        year = datetime.now().year
+        checked = 0
+        mismatched = []
+        last_id = 0
+
+        # Compare one chunk of customers at a time against freshly aggregated loan rows
+        while chunk := list(
+            Customer.objects.filter(customer_id__gt=last_id)
+            .order_by('customer_id')
+            .values_list('customer_id', flat=True)[:BULK_CHUNK_SIZE]
+        ):
+            expected = get_credit_aggregates_bulk(chunk, year)
+            stored = {
+                row['customer_id']: row
+                for row in credit_stats_queryset(year).filter(customer_id__in=chunk)
+            }
+
+            for customer_id in chunk:
+                row = stored.get(customer_id)
+                if row is None or any(
+                    row[field] != (expected[customer_id][field] or 0) for field in CREDIT_FIELDS
+                ):
+                    mismatched.append(customer_id)
+
+            checked += len(chunk)
+            last_id = chunk[-1]
+
+        self.stdout.write(f"Checked {checked} customers, {len(mismatched)} out of date")
+
+        if mismatched and options['fix']:
+            rebuilt = rebuild_credit_stats(mismatched)
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} credit stats rows"))
+        elif mismatched:
+            self.stdout.write(f"Customer ids: {mismatched[:20]}{' ...' if len(mismatched) > 20 else ''}")
@@ -0,0 +1,143 @@
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from django.http import HttpResponse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+
+# Per-request timings, filled in by the SQL execute wrapper and by stage() around the credit checks.
+# A ContextVar rather than a thread local, so async views and the ORM threads they hand work to
+# record into the same request.
+_timings = ContextVar('request_timings', default=None)
+
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+STAGE_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1)
+
+REQUEST_SECONDS = Histogram(
+    'api_request_duration_seconds', 'Request latency', ['endpoint', 'method', 'status'],
+)
+REQUEST_QUERIES = Histogram(
+    'api_request_db_queries', 'SQL queries per request', ['endpoint'], buckets=QUERY_BUCKETS,
+)
+REQUEST_DB_SECONDS = Histogram(
+    'api_request_db_duration_seconds', 'Time spent in SQL per request', ['endpoint'],
+)
+REQUEST_STAGE_SECONDS = Histogram(
+    'api_request_stage_duration_seconds', 'Time spent in credit scoring and EMI checks per request',
+    ['endpoint', 'stage'], buckets=STAGE_BUCKETS,
+)
+
+# Counted in-process rather than in the cache itself, so a hit costs no extra cache round trip
+CREDIT_SCORE_CACHE_LOOKUPS = Counter(
+    'credit_score_cache_lookups', 'Credit score cache lookups by result (hit, miss, unavailable)', ['result'],
+)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.stages = defaultdict(float)
+        self.customer_id = None
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+@contextmanager
+def track_request():
+    """Collect timings for the code inside the block, yielding the RequestTimings"""
+    timings = RequestTimings()
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    # Installed on every connection; only counts while a request is being tracked
+
+    timings = _timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.db_seconds += time.perf_counter() - started
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created receiver that adds record_query to each new database connection"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def stage(name):
+    """Add the time spent in the block to the current request's `name` stage"""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.stages[name] += time.perf_counter() - started
+
+
+def timed(name):
+    """Decorator form of stage() for sync functions"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def note_customer(customer_id):
+    # Remember which customer the request is about, for the slow-request log
+
+    timings = _timings.get()
+    if timings is not None and timings.customer_id is None:
+        timings.customer_id = customer_id
+
+
+def observe(endpoint, method, status, timings):
+    REQUEST_SECONDS.labels(endpoint, method, status).observe(timings.elapsed)
+    REQUEST_QUERIES.labels(endpoint).observe(timings.queries)
+    REQUEST_DB_SECONDS.labels(endpoint).observe(timings.db_seconds)
+    for name, seconds in timings.stages.items():
+        REQUEST_STAGE_SECONDS.labels(endpoint, name).observe(seconds)
+
+
+def server_timing(timings):
+    """Server-Timing header value: total, SQL and per-stage durations in milliseconds"""
+    entries = [
+        f'total;dur={timings.elapsed * 1000:.1f}',
+        f'db;dur={timings.db_seconds * 1000:.1f};desc="{timings.queries} queries"',
+    ]
+    entries += [f'{name};dur={seconds * 1000:.1f}' for name, seconds in timings.stages.items()]
+    return ', '.join(entries)
+
+
+def metrics_view(request):
+    """Prometheus exposition of the request histograms"""
+    registry = REGISTRY
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        # Several worker processes: merge the files each of them writes
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,54 @@
+import logging
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from .metrics import observe, server_timing, track_request
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """Record latency, SQL queries and credit-check time per request for /metrics and Server-Timing
+
+    Place it first in MIDDLEWARE so the latency covers the other middleware too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        with track_request() as timings:
+            response = self.get_response(request)
+        self.finish(request, response, timings)
+        return response
+
+    async def __acall__(self, request):
+        with track_request() as timings:
+            response = await self.get_response(request)
+        self.finish(request, response, timings)
+        return response
+
+    def finish(self, request, response, timings):
+        match = request.resolver_match
+        endpoint = (match.url_name or match.view_name) if match else 'unmatched'
+        observe(endpoint, request.method, response.status_code, timings)
+
+        if settings.SERVER_TIMING_ENABLED:
+            response['Server-Timing'] = server_timing(timings)
+
+        elapsed_ms = timings.elapsed * 1000
+        if elapsed_ms >= settings.SLOW_REQUEST_MS:
+            customer_id = match.kwargs.get('customer_id') if match else None
+            logger.warning(
+                "Slow request %s %s: %.0f ms, %d queries in %.0f ms, customer %s, stages %s",
+                request.method, endpoint, elapsed_ms, timings.queries, timings.db_seconds * 1000,
+                customer_id or timings.customer_id,
+                {name: round(seconds * 1000, 1) for name, seconds in timings.stages.items()},
+            )
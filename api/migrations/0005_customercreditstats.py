@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_importcheckpoint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CustomerCreditStats",
+            fields=[
+                (
+                    "customer",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="credit_stats",
+                        serialize=False,
+                        to="api.customer",
+                    ),
+                ),
+                ("total_loans", models.IntegerField(default=0)),
+                ("total_tenure", models.IntegerField(default=0)),
+                ("emis_paid_on_time", models.IntegerField(default=0)),
+                (
+                    "total_loan_amount",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "active_loan_amount",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "active_emi_total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("current_year_loans", models.IntegerField(default=0)),
+                ("stats_year", models.IntegerField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "customer_credit_stats",
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:58
+
+from django.db import migrations, models
+from api.migration_operations import AddIndexConcurrentlyOnPostgres
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("api", "0005_customercreditstats"),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgres(
+            model_name="loan",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["customer"],
+                include=("loan_amount", "monthly_repayment"),
+                name="loan_active_customer_idx",
+            ),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name="loan",
+            index=models.Index(
+                fields=["customer", "start_date"], name="loan_customer_start_idx"
+            ),
+        ),
+    ]
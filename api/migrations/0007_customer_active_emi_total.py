@@ -0,0 +1,54 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:00
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_customer_debt(apps, schema_editor):
+    Customer = apps.get_model("api", "Customer")
+    Loan = apps.get_model("api", "Loan")
+
+    def active_loan_sum(field):
+        total = (
+            Loan.objects.filter(customer_id=OuterRef("customer_id"), is_active=True)
+            .order_by()
+            .values("customer_id")
+            .annotate(total=Sum(field))
+            .values("total")
+        )
+        return Coalesce(
+            Subquery(total),
+            Value(Decimal("0")),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        )
+
+    Customer.objects.update(
+        current_debt=active_loan_sum("loan_amount"),
+        active_emi_total=active_loan_sum("monthly_repayment"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0006_loan_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="customercreditstats",
+            name="active_emi_total",
+        ),
+        migrations.RemoveField(
+            model_name="customercreditstats",
+            name="active_loan_amount",
+        ),
+        migrations.AddField(
+            model_name="customer",
+            name="active_emi_total",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(backfill_customer_debt, migrations.RunPython.noop),
+    ]
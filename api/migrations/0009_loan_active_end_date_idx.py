@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:06
+
+from django.db import migrations, models
+from api.migration_operations import AddIndexConcurrentlyOnPostgres
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("api", "0008_idempotencykey"),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgres(
+            model_name="loan",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["end_date"],
+                name="loan_active_end_date_idx",
+            ),
+        ),
+    ]
@@ -1,5 +1,19 @@
+from datetime import date
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
+
+def repayments_left(is_active, start_date, end_date, tenure, today):
+    # EMIs still due as of today: none once the loan is inactive or past its end date
+
+    if not is_active or today > end_date:
+        return 0
+
+    months_passed = (today.year - start_date.year) * 12 + (today.month - start_date.month)
+
+    return max(0, tenure - months_passed)
+
+
 class Customer(models.Model):
     customer_id = models.AutoField(primary_key=True)
     first_name = models.CharField(max_length=50)
@@ -8,7 +22,8 @@ class Customer(models.Model):
     phone_number = models.BigIntegerField()
     monthly_salary = models.DecimalField(max_digits=12, decimal_places=2)
     approved_limit = models.DecimalField(max_digits=12, decimal_places=2)
-    current_debt = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    current_debt = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # sum of active loan amounts
+    active_emi_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # sum of active monthly repayments
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -38,14 +53,67 @@ class Loan(models.Model):
 
     @property
     def repayments_left(self):
-        from datetime import date
-        if not self.is_active or date.today() > self.end_date:
-            return 0
+        return repayments_left(self.is_active, self.start_date, self.end_date, self.tenure, date.today())
+
+    class Meta:
+        db_table = 'loan'
+        indexes = [
+            # Active loans per customer, covering the columns summed by the debt and EMI checks
+            models.Index(
+                fields=['customer'],
+                include=['loan_amount', 'monthly_repayment'],
+                condition=models.Q(is_active=True),
+                name='loan_active_customer_idx',
+            ),
+            # Per-customer history ordered by start date, for the current-year range
+            models.Index(fields=['customer', 'start_date'], name='loan_customer_start_idx'),
+            # Active loans by end date, for the nightly sweep of matured loans
+            models.Index(fields=['end_date'], condition=models.Q(is_active=True), name='loan_active_end_date_idx'),
+        ]
 
-        months_passed = (date.today().year - self.start_date.year) * 12 + \
-                        (date.today().month - self.start_date.month)
 
-        return max(0, self.tenure - months_passed)
+class CustomerCreditStats(models.Model):
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, primary_key=True, related_name='credit_stats')
+    total_loans = models.IntegerField(default=0)
+    total_tenure = models.IntegerField(default=0)
+    emis_paid_on_time = models.IntegerField(default=0)
+    total_loan_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    current_year_loans = models.IntegerField(default=0)
+    stats_year = models.IntegerField()  # year that current_year_loans counts
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Credit stats for customer {self.customer_id}"
 
     class Meta:
-        db_table = 'loan'
+        db_table = 'customer_credit_stats'
+
+
+class ImportCheckpoint(models.Model):
+    source = models.CharField(max_length=255, unique=True)
+    last_row = models.BigIntegerField(default=0)  # rows committed so far, excluding the header
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source} @ {self.last_row}"
+
+    class Meta:
+        db_table = 'import_checkpoint'
+
+
+class IdempotencyKey(models.Model):
+    endpoint = models.CharField(max_length=100)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)  # sha256 of the request body
+    response_status = models.PositiveSmallIntegerField()
+    response_body = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.endpoint} {self.key}"
+
+    class Meta:
+        db_table = 'idempotency_key'
+        constraints = [
+            models.UniqueConstraint(fields=['endpoint', 'key'], name='idempotency_endpoint_key_uniq'),
+        ]
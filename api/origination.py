@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+from functools import partial
+from django.db import transaction
+from .models import Loan
+from .routers import stick_many_to_primary
+from .scoring import BULK_CHUNK_SIZE, record_loans
+from .utils import CreditEvaluation, calculate_monthly_installment
+
+APPROVED = "Loan approved successfully"
+LOW_CREDIT_SCORE = "Loan not approved due to low credit score"
+EMI_CONSTRAINT = "Loan not approved due to EMI constraint (>50% of monthly salary)"
+CUSTOMER_NOT_FOUND = "Customer not found"
+
+
+def loan_end_date(start_date, tenure):
+    return start_date + timedelta(days=tenure * 30)  # Approximate
+
+
+def originate_loans(applications, batch_size=BULK_CHUNK_SIZE):
+    """Decide and insert a batch of loan applications, returning one result per application in order
+
+    Applications are decided in order, as if they had been submitted one at a time: each approval is
+    folded into its customer's stats, so the score, rate, installment and limits for that customer's
+    later applications include it. The customers stay locked until the batch commits.
+    """
+    evaluations = CreditEvaluation.load_many({application['customer_id'] for application in applications})
+    start_date = datetime.now().date()
+    results = []
+    approved = []
+
+    with transaction.atomic():
+        CreditEvaluation.lock_customers(evaluations)
+
+        for application in applications:
+            customer_id = application['customer_id']
+            evaluation = evaluations.get(customer_id)
+            result = {
+                'loan_id': None,
+                'customer_id': customer_id,
+                'loan_approved': False,
+                'monthly_installment': None,
+            }
+            results.append(result)
+
+            if evaluation is None:
+                result['message'] = CUSTOMER_NOT_FOUND
+                continue
+
+            # Quoted from the current score, which add_loan resets after each approval
+            corrected_rate = evaluation.interest_rate(application['interest_rate'])
+            monthly_installment = calculate_monthly_installment(
+                application['loan_amount'], corrected_rate or application['interest_rate'], application['tenure']
+            )
+            result['monthly_installment'] = monthly_installment
+
+            if corrected_rate is None or evaluation.credit_score <= 10 or not evaluation.within_approved_limit():
+                result['message'] = LOW_CREDIT_SCORE
+            elif not evaluation.within_emi_limit(monthly_installment):
+                result['message'] = EMI_CONSTRAINT
+            else:
+                loan = Loan(
+                    customer_id=customer_id,
+                    loan_amount=application['loan_amount'],
+                    tenure=application['tenure'],
+                    interest_rate=corrected_rate,
+                    monthly_repayment=monthly_installment,
+                    start_date=start_date,
+                    end_date=loan_end_date(start_date, application['tenure']),
+                )
+                evaluation.add_loan(loan)
+                result.update(loan_approved=True, message=APPROVED)
+                approved.append((result, loan))
+
+        loans = Loan.objects.bulk_create([loan for _, loan in approved], batch_size=batch_size)
+        for (result, _), loan in zip(approved, loans):
+            result['loan_id'] = loan.loan_id
+
+        record_loans(loans)
+        transaction.on_commit(partial(stick_many_to_primary, {loan.customer_id for loan in loans}))
+
+    return results
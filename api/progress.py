@@ -0,0 +1,81 @@
+import time
+from collections import Counter
+
+# Import progress for the loader tasks, published as the Celery task's PROGRESS state so
+# GET /api/admin/tasks/<task_id>/ can report it while the import runs.
+
+PROGRESS_STATE = 'PROGRESS'
+PUBLISH_INTERVAL = 1.0
+
+
+class ImportProgress:
+    """Rows processed, rows/sec, skips by reason, batch commit latency and ETA for one import"""
+
+    def __init__(self, kind, total_rows=None, task=None, publish_interval=PUBLISH_INTERVAL):
+        self.kind = kind
+        self.total_rows = total_rows
+        self.task = task
+        self.publish_interval = publish_interval
+        self.started = time.perf_counter()
+        self.published = 0.0
+        self.rows = 0
+        self.created = 0
+        self.skipped = Counter()
+        self.batches = 0
+        self.commit_seconds = []
+        self.phase = 'loading'
+
+    def set_phase(self, phase):
+        """Name the step the import is in once the rows are written, e.g. rebuilding credit stats"""
+        self.phase = phase
+        self.publish(force=True)
+
+    def skip(self, reason, rows):
+        """Count rows dropped before they reach a batch"""
+        self.rows += rows
+        self.skipped[reason] += rows
+
+    def batch(self, rows, created, commit_seconds, skipped=None):
+        """Record one committed batch and publish the progress if it is due"""
+        self.rows += rows
+        self.created += created
+        self.batches += 1
+        self.commit_seconds.append(commit_seconds)
+        if skipped:
+            self.skipped.update(skipped)
+        self.publish()
+
+    def snapshot(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.rows / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, self.total_rows - self.rows) if self.total_rows is not None else None
+        commits = self.commit_seconds
+
+        return {
+            'kind': self.kind,
+            'phase': self.phase,
+            'rows_total': self.total_rows,
+            'rows_processed': self.rows,
+            'created': self.created,
+            'skipped': dict(self.skipped),
+            'rows_per_sec': round(rate, 1),
+            'elapsed_seconds': round(elapsed, 3),
+            'eta_seconds': round(remaining / rate, 1) if remaining is not None and rate else None,
+            'batches': self.batches,
+            'batch_commit_ms': {
+                'last': round(commits[-1] * 1000, 2),
+                'mean': round(sum(commits) / len(commits) * 1000, 2),
+                'max': round(max(commits) * 1000, 2),
+            } if commits else None,
+        }
+
+    def publish(self, force=False):
+        # Only when running as a Celery task; direct calls (management commands) have no task id
+
+        if self.task is None or not self.task.request.id:
+            return
+
+        now = time.perf_counter()
+        if force or now - self.published >= self.publish_interval:
+            self.task.update_state(state=PROGRESS_STATE, meta=self.snapshot())
+            self.published = now
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from .models import Loan
+from .routers import replica_reads
+from .scoring import BULK_CHUNK_SIZE
+from .serializers import LOAN_DETAIL_FIELDS
+
+# Loan loaders for the read endpoints. Each one fetches a loan together with its customer in a
+# single joined query and reads only the columns the response needs, so nothing is lazily loaded.
+
+
+def fetch_loan_detail_rows(manager, loan_ids):
+    # One joined values_list() query per BULK_CHUNK_SIZE ids
+
+    rows = {}
+    for i in range(0, len(loan_ids), BULK_CHUNK_SIZE):
+        for row in manager.filter(loan_id__in=loan_ids[i:i + BULK_CHUNK_SIZE]).values_list(*LOAN_DETAIL_FIELDS):
+            rows[row[0]] = row
+    return rows
+
+
+def get_loan_detail_rows(loan_ids):
+    """LOAN_DETAIL_FIELDS tuples keyed by loan_id, read in a constant number of queries
+
+    Reads from a replica; ids it does not have yet are retried once against the primary.
+    """
+    loan_ids = list(dict.fromkeys(loan_ids))
+
+    with replica_reads():
+        rows = fetch_loan_detail_rows(Loan.objects, loan_ids)
+
+    missing = [loan_id for loan_id in loan_ids if loan_id not in rows]
+    if missing and settings.DATABASE_REPLICAS:
+        rows.update(fetch_loan_detail_rows(Loan.objects.using(DEFAULT_DB_ALIAS), missing))
+
+    return rows
+
+
+def get_loan_detail_row(loan_id):
+    """The LOAN_DETAIL_FIELDS tuple for one loan, or None"""
+    return get_loan_detail_rows([loan_id]).get(loan_id)
+
+
+async def aget_loan_detail_row(loan_id):
+    # Async get_loan_detail_row; the caller enters the replica routing context
+
+    row = await Loan.objects.filter(loan_id=loan_id).values_list(*LOAN_DETAIL_FIELDS).afirst()
+
+    if row is None and settings.DATABASE_REPLICAS:
+        row = await Loan.objects.using(DEFAULT_DB_ALIAS).filter(loan_id=loan_id).values_list(*LOAN_DETAIL_FIELDS).afirst()
+
+    return row
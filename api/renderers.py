@@ -0,0 +1,35 @@
+from datetime import date, time
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional; the stock renderer produces the same bytes, only slower
+    orjson = None
+
+
+def encode_dates(value):
+    # orjson hands dates and times here (OPT_PASSTHROUGH_DATETIME) so they get DRF's format, e.g. 'Z'
+    # rather than '+00:00' for UTC; anything else orjson cannot encode goes back to the stock path
+    if isinstance(value, (date, time)):
+        return JSONEncoder().default(value)
+    raise TypeError
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes compact responses with orjson when it is installed"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # orjson only writes compact, unescaped UTF-8; other renderer settings take the stock path
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or data is None or indent or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            content = orjson.dumps(data, default=encode_dates, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except TypeError:
+            # Types orjson does not know (e.g. Decimal) go through DRF's encoder
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Match JSONRenderer, which escapes these for JavaScript compatibility
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -0,0 +1,137 @@
+import logging
+import random
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+# Set only inside replica_reads(), so everything else reads from the primary by default
+_replica_reads = ContextVar('replica_reads', default=False)
+
+# Set while the stickiness cache is failing, so an outage is logged once
+_sticky_cache_down = False
+
+
+def sticky_key(customer_id):
+    return f'replica:sticky:{customer_id}'
+
+
+def sticky_cache_failed(error):
+    # One warning per outage, not one per request; sticky_cache_ok() re-arms it once the cache answers
+
+    global _sticky_cache_down
+    if not _sticky_cache_down:
+        _sticky_cache_down = True
+        logger.warning("Replica stickiness cache unavailable, reading from the primary: %r", error)
+
+
+def sticky_cache_ok():
+    global _sticky_cache_down
+    _sticky_cache_down = False
+
+
+def stick_to_primary(customer_id):
+    """Send this customer's reads to the primary for REPLICA_STICKY_SECONDS after a write"""
+    if not settings.DATABASE_REPLICAS:
+        return
+
+    try:
+        cache.set(sticky_key(customer_id), 1, timeout=settings.REPLICA_STICKY_SECONDS)
+    except Exception as e:
+        sticky_cache_failed(e)
+    else:
+        sticky_cache_ok()
+
+
+def stick_many_to_primary(customer_ids):
+    """stick_to_primary for a batch of customers, in one cache round trip"""
+    if not settings.DATABASE_REPLICAS or not customer_ids:
+        return
+
+    try:
+        cache.set_many({sticky_key(customer_id): 1 for customer_id in customer_ids},
+                       timeout=settings.REPLICA_STICKY_SECONDS)
+    except Exception as e:
+        sticky_cache_failed(e)
+    else:
+        sticky_cache_ok()
+
+
+def is_sticky(customer_id):
+    # Without the cache we cannot tell, so assume a recent write and stay on the primary
+
+    try:
+        sticky = cache.get(sticky_key(customer_id)) is not None
+    except Exception as e:
+        sticky_cache_failed(e)
+        return True
+
+    sticky_cache_ok()
+    return sticky
+
+
+@contextmanager
+def replica_reads(customer_id=None):
+    """Route ORM reads in this block to a replica, unless the customer wrote recently"""
+    if not settings.DATABASE_REPLICAS or (customer_id is not None and is_sticky(customer_id)):
+        yield
+        return
+
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def pinned(queryset):
+    """Fix the database a lazy queryset reads from, for querysets evaluated after replica_reads() exits"""
+    return queryset.using(queryset.db)
+
+
+async def ais_sticky(customer_id):
+    try:
+        sticky = await cache.aget(sticky_key(customer_id)) is not None
+    except Exception as e:
+        sticky_cache_failed(e)
+        return True
+
+    sticky_cache_ok()
+    return sticky
+
+
+@asynccontextmanager
+async def areplica_reads(customer_id=None):
+    """replica_reads() for async views; the async ORM carries the context into its worker thread"""
+    if not settings.DATABASE_REPLICAS or (customer_id is not None and await ais_sticky(customer_id)):
+        yield
+        return
+
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """Reads go to a random replica inside replica_reads(); writes and migrations go to the primary"""
+
+    def db_for_read(self, model, **hints):
+        # Reads inside a transaction must see that transaction's writes
+        if not _replica_reads.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data, so objects may be related across them
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
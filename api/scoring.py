@@ -0,0 +1,460 @@
+from asgiref.sync import sync_to_async
+from decimal import Decimal
+from datetime import date, datetime
+from functools import partial
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .cache import invalidate_all_credit_scores, invalidate_credit_score
+from .models import Customer, CustomerCreditStats, Loan
+
+BULK_CHUNK_SIZE = 1000
+SWEEP_BATCH_SIZE = 5000
+
+STATS_FIELDS = (
+    'total_loans',
+    'total_tenure',
+    'emis_paid_on_time',
+    'total_loan_amount',
+    'current_year_loans',
+)
+
+# Active-loan totals live on the customer row, under these aggregate names
+DEBT_FIELDS = {
+    'active_loan_amount': 'current_debt',
+    'active_emi_amount': 'active_emi_total',
+}
+
+CREDIT_FIELDS = (*STATS_FIELDS, *DEBT_FIELDS)
+
+
+def current_year_lookup(field, year):
+    # A plain half-open date range, so (customer, start_date) indexes can serve it
+
+    return {f'{field}__gte': date(year, 1, 1), f'{field}__lt': date(year + 1, 1, 1)}
+
+
+def credit_aggregate_annotations(year=None):
+    # Conditional aggregates over a customer's loans, computed in one GROUP BY
+
+    year = year or datetime.now().year
+
+    return {
+        'total_loans': Count('loans'),
+        'total_tenure': Sum('loans__tenure'),
+        'emis_paid_on_time': Sum('loans__emis_paid_on_time'),
+        'total_loan_amount': Sum('loans__loan_amount'),
+        'active_loan_amount': Sum('loans__loan_amount', filter=Q(loans__is_active=True)),
+        'active_emi_amount': Sum('loans__monthly_repayment', filter=Q(loans__is_active=True)),
+        'current_year_loans': Count('loans', filter=Q(**current_year_lookup('loans__start_date', year))),
+    }
+
+
+def get_credit_aggregates(customer_id, year=None):
+    # Fetch approved limit, salary and all loan aggregates for a customer in a single query.
+    # These feed stats rebuilds, so they always come from the primary, never a lagging replica
+
+    annotations = credit_aggregate_annotations(year)
+
+    return (
+        Customer.objects.using(DEFAULT_DB_ALIAS)
+        .filter(customer_id=customer_id)
+        .annotate(**annotations)
+        .values('customer_id', 'approved_limit', 'monthly_salary', *annotations)
+        .first()
+    )
+
+
+def get_credit_aggregates_bulk(customer_ids, year=None):
+    # Fetch aggregates for many customers with one grouped query per chunk of ids, from the primary
+
+    annotations = credit_aggregate_annotations(year)
+    customer_ids = list(dict.fromkeys(customer_ids))
+    results = {}
+
+    for i in range(0, len(customer_ids), BULK_CHUNK_SIZE):
+        rows = (
+            Customer.objects.using(DEFAULT_DB_ALIAS)
+            .filter(customer_id__in=customer_ids[i:i + BULK_CHUNK_SIZE])
+            .annotate(**annotations)
+            .values('customer_id', 'approved_limit', 'monthly_salary', *annotations)
+        )
+        for row in rows:
+            results[row['customer_id']] = row
+
+    return results
+
+
+def save_credit_stats(aggregates, year):
+    # Upsert stats rows from raw aggregates in one statement
+
+    objects = [
+        CustomerCreditStats(
+            customer_id=row['customer_id'],
+            stats_year=year,
+            **{field: row[field] or 0 for field in STATS_FIELDS},
+        )
+        for row in aggregates
+    ]
+
+    CustomerCreditStats.objects.bulk_create(
+        objects,
+        update_conflicts=True,
+        unique_fields=['customer'],
+        update_fields=[*STATS_FIELDS, 'stats_year', 'updated_at'],
+    )
+    return len(objects)
+
+
+def active_loan_sum(field):
+    # Correlated subquery summing one column over a customer's active loans
+
+    total = (
+        Loan.objects.filter(customer_id=OuterRef('customer_id'), is_active=True)
+        .order_by()
+        .values('customer_id')
+        .annotate(total=Sum(field))
+        .values('total')
+    )
+    return Coalesce(Subquery(total), Value(Decimal('0')), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def recompute_customer_debt(customer_ids):
+    """Reset current_debt and active_emi_total from the active loan rows in one UPDATE"""
+    return Customer.objects.filter(customer_id__in=customer_ids).update(
+        current_debt=active_loan_sum('loan_amount'),
+        active_emi_total=active_loan_sum('monthly_repayment'),
+    )
+
+
+def rebuild_customer_credit(customer_ids, year):
+    # Stats row and denormalised debt columns for one chunk of customers
+
+    recompute_customer_debt(customer_ids)
+    return save_credit_stats(get_credit_aggregates_bulk(customer_ids, year).values(), year)
+
+
+def rebuild_credit_stats(customer_ids=None):
+    """Recompute stats rows and customer debt columns from the loan table, for the given customers or everyone"""
+    year = datetime.now().year
+
+    if customer_ids is not None:
+        customer_ids = list(customer_ids)
+        for customer_id in customer_ids:
+            transaction.on_commit(partial(invalidate_credit_score, customer_id))
+
+        return sum(
+            rebuild_customer_credit(customer_ids[i:i + BULK_CHUNK_SIZE], year)
+            for i in range(0, len(customer_ids), BULK_CHUNK_SIZE)
+        )
+
+    transaction.on_commit(invalidate_all_credit_scores)
+
+    # Walk the whole customer table in primary-key order, one chunk at a time
+    rebuilt = 0
+    last_id = 0
+    while chunk := list(
+        Customer.objects.filter(customer_id__gt=last_id)
+        .order_by('customer_id')
+        .values_list('customer_id', flat=True)[:BULK_CHUNK_SIZE]
+    ):
+        rebuilt += rebuild_customer_credit(chunk, year)
+        last_id = chunk[-1]
+
+    return rebuilt
+
+
+def credit_stats_queryset(year):
+    # Current-year stats rows joined to the customer columns the checks need
+
+    return (
+        CustomerCreditStats.objects
+        .filter(stats_year=year)
+        .values(
+            'customer_id',
+            *STATS_FIELDS,
+            approved_limit=F('customer__approved_limit'),
+            monthly_salary=F('customer__monthly_salary'),
+            **{name: F(f'customer__{column}') for name, column in DEBT_FIELDS.items()},
+        )
+    )
+
+
+def build_missing_credit_stats(customer_ids, year):
+    """Build the stats rows and debt columns of customers that still lack a current stats row
+
+    Runs in one transaction with the customer rows locked, in id order so overlapping requests
+    cannot deadlock. A request that waited for another building the same rows finds them built.
+    """
+    customer_ids = sorted(set(customer_ids))
+
+    with transaction.atomic():
+        for i in range(0, len(customer_ids), BULK_CHUNK_SIZE):
+            locked = list(
+                Customer.objects.select_for_update()
+                .filter(customer_id__in=customer_ids[i:i + BULK_CHUNK_SIZE])
+                .order_by('customer_id')
+                .values_list('customer_id', flat=True)
+            )
+            built = set(
+                CustomerCreditStats.objects.filter(customer_id__in=locked, stats_year=year)
+                .values_list('customer_id', flat=True)
+            )
+            missing = [customer_id for customer_id in locked if customer_id not in built]
+            if missing:
+                rebuild_customer_credit(missing, year)
+
+
+def get_credit_stats(customer_id):
+    """Read a customer's precomputed stats with a single primary-key lookup
+
+    Rows that are missing or were computed in a previous year are answered from the loan table
+    and rebuilt with build_missing_credit_stats().
+    """
+    year = datetime.now().year
+    stats = credit_stats_queryset(year).filter(customer_id=customer_id).first()
+
+    if stats is None:
+        stats = get_credit_aggregates(customer_id, year)
+        if stats is not None:
+            build_missing_credit_stats([customer_id], year)
+
+    return stats
+
+
+async def aget_credit_stats(customer_id):
+    # Async get_credit_stats: the stats read uses the async ORM, the rare rebuild runs in a thread
+
+    year = datetime.now().year
+    stats = await credit_stats_queryset(year).filter(customer_id=customer_id).afirst()
+
+    if stats is None:
+        stats = await sync_to_async(get_credit_stats)(customer_id)
+
+    return stats
+
+
+def get_credit_stats_bulk(customer_ids):
+    # Precomputed stats for many customers, rebuilding any missing or stale rows
+
+    year = datetime.now().year
+    customer_ids = list(dict.fromkeys(customer_ids))
+    results = {}
+
+    for i in range(0, len(customer_ids), BULK_CHUNK_SIZE):
+        for row in credit_stats_queryset(year).filter(customer_id__in=customer_ids[i:i + BULK_CHUNK_SIZE]):
+            results[row['customer_id']] = row
+
+    missing = [customer_id for customer_id in customer_ids if customer_id not in results]
+    if missing:
+        rebuilt = get_credit_aggregates_bulk(missing, year)
+        if rebuilt:
+            build_missing_credit_stats(rebuilt, year)
+        results.update(rebuilt)
+
+    return results
+
+
+def record_loan(loan):
+    """Fold a newly inserted loan into its customer's stats and debt; call inside the inserting transaction"""
+    year = datetime.now().year
+    updates = {
+        'total_loans': F('total_loans') + 1,
+        'total_tenure': F('total_tenure') + loan.tenure,
+        'emis_paid_on_time': F('emis_paid_on_time') + loan.emis_paid_on_time,
+        'total_loan_amount': F('total_loan_amount') + loan.loan_amount,
+        'updated_at': timezone.now(),
+    }
+
+    if loan.is_active:
+        Customer.objects.filter(customer_id=loan.customer_id).update(
+            current_debt=F('current_debt') + loan.loan_amount,
+            active_emi_total=F('active_emi_total') + loan.monthly_repayment,
+        )
+    if loan.start_date.year == year:
+        updates['current_year_loans'] = F('current_year_loans') + 1
+
+    if not CustomerCreditStats.objects.filter(customer_id=loan.customer_id, stats_year=year).update(**updates):
+        rebuild_credit_stats([loan.customer_id])
+    else:
+        transaction.on_commit(partial(invalidate_credit_score, loan.customer_id))
+
+
+def per_customer(values, output_field=None):
+    # CASE customer_id WHEN ... expression giving each customer its own value in a single UPDATE
+
+    output_field = output_field or DecimalField(max_digits=14, decimal_places=2)
+    return Case(
+        *[When(customer_id=customer_id, then=Value(value)) for customer_id, value in values.items()],
+        default=Value(0),
+        output_field=output_field,
+    )
+
+
+def record_loans(loans):
+    """record_loan for many new loans: one UPDATE for customer debt and one for stats, however many loans"""
+    year = datetime.now().year
+    totals = {}
+
+    for loan in loans:
+        total = totals.setdefault(loan.customer_id, {
+            'loans': 0, 'tenure': 0, 'emis': 0, 'amount': Decimal('0'), 'current_year': 0,
+            'debt': Decimal('0'), 'emi': Decimal('0'),
+        })
+        total['loans'] += 1
+        total['tenure'] += loan.tenure
+        total['emis'] += loan.emis_paid_on_time
+        total['amount'] += loan.loan_amount
+        total['current_year'] += loan.start_date.year == year
+        if loan.is_active:
+            total['debt'] += loan.loan_amount
+            total['emi'] += loan.monthly_repayment
+
+    if not totals:
+        return
+
+    def column(key, output_field=None):
+        return per_customer({customer_id: total[key] for customer_id, total in totals.items()}, output_field)
+
+    Customer.objects.filter(customer_id__in=totals).update(
+        current_debt=F('current_debt') + column('debt'),
+        active_emi_total=F('active_emi_total') + column('emi'),
+    )
+
+    with_stats = set(
+        CustomerCreditStats.objects.filter(customer_id__in=totals, stats_year=year).values_list('customer_id', flat=True)
+    )
+    if with_stats:
+        CustomerCreditStats.objects.filter(customer_id__in=with_stats, stats_year=year).update(
+            total_loans=F('total_loans') + column('loans', IntegerField()),
+            total_tenure=F('total_tenure') + column('tenure', IntegerField()),
+            emis_paid_on_time=F('emis_paid_on_time') + column('emis', IntegerField()),
+            total_loan_amount=F('total_loan_amount') + column('amount'),
+            current_year_loans=F('current_year_loans') + column('current_year', IntegerField()),
+            updated_at=timezone.now(),
+        )
+        for customer_id in with_stats:
+            transaction.on_commit(partial(invalidate_credit_score, customer_id))
+
+    missing = [customer_id for customer_id in totals if customer_id not in with_stats]
+    if missing:
+        rebuild_credit_stats(missing)
+
+
+def deactivate_loans(loans):
+    """Mark active loans inactive and take them out of their customers' debt and EMI totals
+
+    Runs as three set-based statements in one transaction: lock and read the loans, flip
+    is_active, and subtract the per-customer totals with a single CASE update. Returns the
+    number of loans deactivated and the ids of the customers whose totals changed.
+    """
+    with transaction.atomic():
+        rows = list(
+            loans.filter(is_active=True)
+            .select_for_update()
+            .values_list('loan_id', 'customer_id', 'loan_amount', 'monthly_repayment')
+        )
+        if not rows:
+            return {'loans': 0, 'customer_ids': []}
+
+        totals = {}
+        for _, customer_id, loan_amount, monthly_repayment in rows:
+            debt, emi = totals.get(customer_id, (0, 0))
+            totals[customer_id] = (debt + loan_amount, emi + monthly_repayment)
+
+        Loan.objects.filter(loan_id__in=[row[0] for row in rows]).update(is_active=False, updated_at=timezone.now())
+
+        Customer.objects.filter(customer_id__in=totals).update(
+            current_debt=F('current_debt') - per_customer({key: total[0] for key, total in totals.items()}),
+            active_emi_total=F('active_emi_total') - per_customer({key: total[1] for key, total in totals.items()}),
+        )
+
+        for customer_id in totals:
+            transaction.on_commit(partial(invalidate_credit_score, customer_id))
+
+    return {'loans': len(rows), 'customer_ids': list(totals)}
+
+
+def sweep_matured_loans(as_of=None, batch_size=SWEEP_BATCH_SIZE):
+    """Deactivate every active loan that ended before as_of (default today)
+
+    Loans are taken in loan_id order, batch_size at a time, each batch in its own short
+    transaction, so no statement holds row locks on more than one batch. A customer whose
+    loans span several batches is counted once in 'customers'.
+    """
+    as_of = as_of or date.today()
+    totals = {'loans': 0, 'customers': 0, 'batches': 0}
+    customer_ids = set()
+
+    while batch := list(
+        Loan.objects.filter(is_active=True, end_date__lt=as_of)
+        .order_by('loan_id')
+        .values_list('loan_id', flat=True)[:batch_size]
+    ):
+        result = deactivate_loans(Loan.objects.filter(loan_id__in=batch))
+        totals['loans'] += result['loans']
+        customer_ids.update(result['customer_ids'])
+        totals['batches'] += 1
+
+    totals['customers'] = len(customer_ids)
+    return totals
+
+
+def score_from_aggregates(aggregates):
+    # Compute the credit score from pre-aggregated loan history
+
+    total_loans = aggregates['total_loans']
+    approved_limit = aggregates['approved_limit']
+
+    if not total_loans:
+        return 50  # Default score for new customers
+
+    # Check if sum of current loans > approved limit
+
+    if (aggregates['active_loan_amount'] or 0) > approved_limit:
+        return 0
+
+    credit_score = 0
+
+    # Component 1: Past loans paid on time (40% weight)
+
+    total_emis = aggregates['total_tenure'] or 0
+    if total_emis > 0:
+        on_time_ratio = (aggregates['emis_paid_on_time'] or 0) / total_emis
+        credit_score += on_time_ratio * 40
+
+    # Component 2: Number of loans taken (20% weight)
+
+    if total_loans <= 2:
+        credit_score += 20
+    elif total_loans <= 5:
+        credit_score += 15
+    elif total_loans <= 8:
+        credit_score += 10
+    else:
+        credit_score += 5
+
+    # Component 3: Loan activity in current year (20% weight)
+
+    current_year_loans = aggregates['current_year_loans']
+
+    if current_year_loans <= 2:
+        credit_score += 20
+    elif current_year_loans <= 4:
+        credit_score += 15
+    else:
+        credit_score += 10
+
+    # Component 4: Loan approved volume (20% weight)
+
+    total_loan_amount = aggregates['total_loan_amount'] or 0
+
+    if total_loan_amount <= approved_limit * Decimal('0.5'):
+        credit_score += 20
+    elif total_loan_amount <= approved_limit:
+        credit_score += 15
+    else:
+        credit_score += 5
+
+    return min(100, max(0, int(credit_score)))
@@ -1,5 +1,6 @@
+from decimal import Decimal
 from rest_framework import serializers
-from .models import Customer, Loan
+from .models import Customer, Loan, repayments_left
 
 class CustomerRegistrationSerializer(serializers.ModelSerializer):
     first_name = serializers.CharField(max_length=50)
@@ -23,6 +24,15 @@ class CustomerRegistrationResponseSerializer(serializers.ModelSerializer):
     def get_name(self, obj):
         return f"{obj.first_name} {obj.last_name}"
 
+class BulkCustomerRegistrationSerializer(serializers.Serializer):
+    MAX_CUSTOMERS = 5000
+
+    customers = CustomerRegistrationSerializer(many=True, allow_empty=False, max_length=MAX_CUSTOMERS)
+
+class BulkCustomerRegistrationResponseSerializer(serializers.Serializer):
+    created = serializers.IntegerField()
+    customers = CustomerRegistrationResponseSerializer(many=True)  # in the order submitted
+
 class LoanEligibilitySerializer(serializers.Serializer):
     customer_id = serializers.IntegerField()
     loan_amount = serializers.DecimalField(max_digits=12, decimal_places=2)
@@ -50,6 +60,19 @@ class LoanCreateResponseSerializer(serializers.Serializer):
     message = serializers.CharField()
     monthly_installment = serializers.DecimalField(max_digits=12, decimal_places=2)
 
+class BulkLoanCreateSerializer(serializers.Serializer):
+    MAX_LOANS = 1000
+
+    loans = LoanCreateSerializer(many=True, allow_empty=False, max_length=MAX_LOANS)
+
+class BulkLoanResultSerializer(LoanCreateResponseSerializer):
+    monthly_installment = serializers.DecimalField(max_digits=12, decimal_places=2, allow_null=True)
+
+class BulkLoanCreateResponseSerializer(serializers.Serializer):
+    approved = serializers.IntegerField()
+    rejected = serializers.IntegerField()
+    results = BulkLoanResultSerializer(many=True)  # one per submitted loan, in order
+
 class CustomerDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Customer
@@ -68,4 +91,175 @@ class LoanListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Loan
-        fields = ['loan_id', 'loan_amount', 'interest_rate', 'monthly_repayment', 'repayments_left']
\ No newline at end of file
+        fields = ['loan_id', 'loan_amount', 'interest_rate', 'monthly_repayment', 'repayments_left']
+
+# Fast paths for the loan endpoints: plain tuples from values_list() shaped into exactly what
+# LoanDetailSerializer/LoanListSerializer output, without building model instances or DRF fields.
+# Money columns are stored with two decimal places, so formatting them is all DRF would do.
+
+CENTS = Decimal('0.01')
+
+LOAN_LIST_FIELDS = ('loan_id', 'loan_amount', 'interest_rate', 'monthly_repayment',
+                    'is_active', 'start_date', 'end_date', 'tenure')
+
+LOAN_DETAIL_FIELDS = ('loan_id', 'customer__customer_id', 'customer__first_name', 'customer__last_name',
+                      'customer__phone_number', 'customer__age', 'loan_amount', 'interest_rate',
+                      'monthly_repayment', 'is_active', 'start_date', 'end_date', 'tenure')
+
+
+def decimal_string(value):
+    return format(value.quantize(CENTS), 'f')
+
+
+def loan_list_row(row, today):
+    loan_id, loan_amount, interest_rate, monthly_repayment, is_active, start_date, end_date, tenure = row
+
+    return {
+        'loan_id': loan_id,
+        'loan_amount': decimal_string(loan_amount),
+        'interest_rate': decimal_string(interest_rate),
+        'monthly_repayment': decimal_string(monthly_repayment),
+        'repayments_left': repayments_left(is_active, start_date, end_date, tenure, today),
+    }
+
+
+def loan_list_data(rows, today):
+    return [loan_list_row(row, today) for row in rows]
+
+
+def loan_detail_data(row, today):
+    (loan_id, customer_id, first_name, last_name, phone_number, age, loan_amount, interest_rate,
+     monthly_repayment, is_active, start_date, end_date, tenure) = row
+
+    return {
+        'loan_id': loan_id,
+        'customer': {
+            'customer_id': customer_id,
+            'first_name': first_name,
+            'last_name': last_name,
+            'phone_number': phone_number,
+            'age': age,
+        },
+        'loan_amount': decimal_string(loan_amount),
+        'interest_rate': decimal_string(interest_rate),
+        'monthly_repayment': decimal_string(monthly_repayment),
+        'tenure': tenure,
+        'repayments_left': repayments_left(is_active, start_date, end_date, tenure, today),
+    }
+
+ELIGIBILITY_DECIMAL_FIELDS = ('interest_rate', 'corrected_interest_rate', 'monthly_installment')
+
+
+def eligibility_data(result):
+    # CreditEvaluation.eligibility() output formatted as LoanEligibilityResponseSerializer would
+
+    return {**result, **{field: decimal_string(Decimal(str(result[field]))) for field in ELIGIBILITY_DECIMAL_FIELDS}}
+
+LOAN_EXPORT_FIELDS = ('loan_id', 'customer_id', 'loan_amount', 'interest_rate', 'monthly_repayment', 'tenure',
+                      'emis_paid_on_time', 'start_date', 'end_date', 'is_active')
+
+
+def loan_export_row(row, today):
+    (loan_id, customer_id, loan_amount, interest_rate, monthly_repayment, tenure,
+     emis_paid_on_time, start_date, end_date, is_active) = row
+
+    return {
+        'loan_id': loan_id,
+        'customer_id': customer_id,
+        'loan_amount': decimal_string(loan_amount),
+        'interest_rate': decimal_string(interest_rate),
+        'monthly_repayment': decimal_string(monthly_repayment),
+        'tenure': tenure,
+        'emis_paid_on_time': emis_paid_on_time,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'is_active': is_active,
+        'repayments_left': repayments_left(is_active, start_date, end_date, tenure, today),
+    }
+
+MAX_PAGE_SIZE = 1000
+STREAM_FORMATS = ['json', 'ndjson']
+
+class LoanPageQuerySerializer(serializers.Serializer):
+    cursor = serializers.IntegerField(min_value=0, required=False)  # last loan_id of the previous page
+    limit = serializers.IntegerField(min_value=1, max_value=MAX_PAGE_SIZE, default=100)
+    stream = serializers.ChoiceField(choices=STREAM_FORMATS, required=False)
+
+class PortfolioExportQuerySerializer(serializers.Serializer):
+    stream = serializers.ChoiceField(choices=STREAM_FORMATS, default='ndjson')
+    active = serializers.BooleanField(allow_null=True, default=None)  # None exports every loan
+
+class LoanBatchQuerySerializer(serializers.Serializer):
+    MAX_IDS = 1000
+
+    ids = serializers.CharField()  # comma separated loan ids
+
+    def validate_ids(self, value):
+        try:
+            ids = [int(part) for part in value.split(',') if part.strip()]
+        except ValueError:
+            raise serializers.ValidationError("Expected a comma separated list of loan ids")
+
+        if not ids:
+            raise serializers.ValidationError("At least one loan id is required")
+        if len(ids) > self.MAX_IDS:
+            raise serializers.ValidationError(f"At most {self.MAX_IDS} loan ids per request, got {len(ids)}")
+        return ids
+
+class CreditScoreBatchSerializer(serializers.Serializer):
+    customer_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=10000)
+
+class CreditScoreSerializer(serializers.Serializer):
+    customer_id = serializers.IntegerField()
+    credit_score = serializers.IntegerField()
+
+class CreditScoreBatchResponseSerializer(serializers.Serializer):
+    scores = CreditScoreSerializer(many=True)
+    not_found = serializers.ListField(child=serializers.IntegerField())
+
+class LoanQuoteSerializer(serializers.Serializer):
+    MAX_QUOTES = 1000
+
+    customer_id = serializers.IntegerField()
+    loan_amounts = serializers.ListField(child=serializers.DecimalField(max_digits=12, decimal_places=2), allow_empty=False)
+    interest_rates = serializers.ListField(child=serializers.DecimalField(max_digits=5, decimal_places=2), allow_empty=False)
+    tenures = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+
+    def validate(self, data):
+        count = len(data['loan_amounts']) * len(data['interest_rates']) * len(data['tenures'])
+        if count > self.MAX_QUOTES:
+            raise serializers.ValidationError(f"At most {self.MAX_QUOTES} quotes per request, got {count}")
+        return data
+
+class LoanQuoteItemSerializer(serializers.Serializer):
+    loan_amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    approval = serializers.BooleanField()
+    interest_rate = serializers.DecimalField(max_digits=5, decimal_places=2)
+    corrected_interest_rate = serializers.DecimalField(max_digits=5, decimal_places=2)
+    tenure = serializers.IntegerField()
+    monthly_installment = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+class LoanQuoteResponseSerializer(serializers.Serializer):
+    customer_id = serializers.IntegerField()
+    quotes = LoanQuoteItemSerializer(many=True)
+
+class ScheduleQuerySerializer(serializers.Serializer):
+    offset = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(min_value=1, max_value=120, default=12)
+
+class ScheduleRowSerializer(serializers.Serializer):
+    installment_number = serializers.IntegerField()
+    due_date = serializers.DateField()
+    payment = serializers.DecimalField(max_digits=12, decimal_places=2)
+    principal = serializers.DecimalField(max_digits=12, decimal_places=2)
+    interest = serializers.DecimalField(max_digits=12, decimal_places=2)
+    balance = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+class LoanScheduleSerializer(serializers.Serializer):
+    loan_id = serializers.IntegerField()
+    monthly_installment = serializers.DecimalField(max_digits=12, decimal_places=2)
+    tenure = serializers.IntegerField()
+    payoff_date = serializers.DateField()
+    offset = serializers.IntegerField()
+    limit = serializers.IntegerField()
+    results = ScheduleRowSerializer(many=True)
\ No newline at end of file
@@ -0,0 +1,61 @@
+import json
+from django.http import StreamingHttpResponse
+
+try:
+    import orjson
+except ImportError:  # optional; json.dumps writes the same compact JSON
+    orjson = None
+
+# Rows fetched per database round trip and rows written per response chunk
+STREAM_CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def dumps(item):
+    if orjson is not None:
+        return orjson.dumps(item)
+    return json.dumps(item, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def ndjson_chunks(items):
+    # One JSON document per line, STREAM_CHUNK_SIZE lines per chunk
+
+    lines = []
+    for item in items:
+        lines.append(dumps(item))
+        if len(lines) == STREAM_CHUNK_SIZE:
+            yield b'\n'.join(lines) + b'\n'
+            lines = []
+    if lines:
+        yield b'\n'.join(lines) + b'\n'
+
+
+def json_array_chunks(items):
+    # A single JSON array, written a chunk of elements at a time
+
+    yield b'['
+    separator = b''
+    elements = []
+    for item in items:
+        elements.append(dumps(item))
+        if len(elements) == STREAM_CHUNK_SIZE:
+            yield separator + b','.join(elements)
+            separator = b','
+            elements = []
+    if elements:
+        yield separator + b','.join(elements)
+    yield b']'
+
+
+def streaming_response(items, stream_format, filename=None):
+    """Stream an iterable of JSON-ready dicts as a JSON array or NDJSON without holding them in memory"""
+    chunks = ndjson_chunks(items) if stream_format == 'ndjson' else json_array_chunks(items)
+    response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[stream_format])
+
+    if filename:
+        response['Content-Disposition'] = f'attachment; filename="{filename}.{stream_format}"'
+    return response
@@ -0,0 +1,131 @@
+from datetime import date
+import numpy as np
+import pandas as pd
+from django.db import transaction
+from django.db.models import Max
+from .ingest import bulk_load_customers, bulk_load_loans, reset_sequences
+from .models import Customer, Loan
+from .scoring import rebuild_credit_stats
+
+# Seeded synthetic customers and loans for benchmarks. Frames use the Excel sheet columns, so
+# they go through the same bulk loaders (and COPY on PostgreSQL) as the real import.
+
+SYNTHETIC_CHUNK_SIZE = 50000
+LOANS_PER_CUSTOMER = 5
+HISTORY_YEARS = 10
+
+# Consumer loan terms cluster around whole years
+TENURES = np.array([6, 12, 18, 24, 36, 48, 60, 84, 120, 180])
+TENURE_WEIGHTS = np.array([4, 14, 6, 18, 20, 10, 14, 6, 5, 3]) / 100
+
+FIRST_NAMES = np.array(['Aarav', 'Aditi', 'Arjun', 'Diya', 'Ishaan', 'Kavya', 'Meera', 'Neha', 'Rahul', 'Rohan',
+                        'Sanya', 'Vikram', 'Ananya', 'Kabir', 'Priya', 'Siddharth'])
+LAST_NAMES = np.array(['Sharma', 'Verma', 'Gupta', 'Iyer', 'Khan', 'Mehta', 'Nair', 'Patel', 'Reddy', 'Singh'])
+
+
+def chunk_rng(seed, stream, index):
+    # Independent generator per chunk, so a chunk's rows do not depend on how many came before it
+    return np.random.default_rng([seed, stream, index])
+
+
+def synthetic_customers(rng, first_id, count):
+    """Customer sheet rows with ids first_id.. and log-normal salaries"""
+    ids = np.arange(first_id, first_id + count)
+    salaries = np.round(rng.lognormal(mean=np.log(50000), sigma=0.6, size=count), -3).clip(10000, 1000000)
+
+    return pd.DataFrame({
+        'Customer ID': ids,
+        'First Name': rng.choice(FIRST_NAMES, size=count),
+        'Last Name': rng.choice(LAST_NAMES, size=count),
+        'Age': rng.integers(21, 66, size=count),
+        'Phone Number': 9000000000 + ids,
+        'Monthly Salary': salaries,
+        'Approved Limit': np.round(36 * salaries / 100000) * 100000,
+    })
+
+
+def synthetic_loans(rng, first_id, count, customers, today):
+    """Loan sheet rows with ids first_id.. spread over `customers`
+
+    `customers` holds the customer ids, salaries, borrowing weights and on-time payment rates.
+    """
+    picked = np.searchsorted(customers['cumulative_weight'], rng.random(count) * customers['cumulative_weight'][-1])
+    salaries = customers['salaries'][picked]
+
+    tenures = rng.choice(TENURES, size=count, p=TENURE_WEIGHTS)
+    rates = np.round(rng.normal(13, 3, size=count).clip(8, 24), 2)
+    amounts = np.round(salaries * rng.lognormal(mean=np.log(10), sigma=0.6, size=count), -3).clip(10000, None)
+
+    monthly_rate = rates / 1200
+    growth = (1 + monthly_rate) ** tenures
+    repayments = np.round(amounts * monthly_rate * growth / (growth - 1), 2)
+
+    today = np.datetime64(today, 'D')
+    starts = today - rng.integers(0, HISTORY_YEARS * 365, size=count)
+    start_months = starts.astype('datetime64[M]')
+    days = np.minimum((starts - start_months.astype('datetime64[D]')).astype(int), 27)
+    ends = (start_months + tenures).astype('datetime64[D]') + days
+
+    # EMIs due so far, each paid on time with the customer's own probability
+    elapsed = np.minimum(((today - starts).astype(int) // 30), tenures)
+    on_time = rng.binomial(elapsed, customers['on_time_rates'][picked])
+
+    return pd.DataFrame({
+        'Customer ID': customers['ids'][picked],
+        'Loan ID': np.arange(first_id, first_id + count),
+        'Loan Amount': amounts,
+        'Tenure': tenures,
+        'Interest Rate': rates,
+        'Monthly payment': repayments,
+        'EMIs paid on Time': on_time,
+        'Date of Approval': starts,
+        'End Date': ends,
+    })
+
+
+def generate_synthetic_data(loans, customers=None, seed=0, chunk_size=SYNTHETIC_CHUNK_SIZE, use_copy=True,
+                            today=None, progress=None):
+    """Insert `loans` synthetic loans over `customers` new customers, then rebuild credit stats
+
+    The same seed and chunk size always produce the same rows. Ids continue after the highest ids
+    already stored, so the data can sit next to the sample sheets.
+    """
+    customers = customers or max(1, loans // LOANS_PER_CUSTOMER)
+    today = today or date.today()
+
+    first_customer_id = (Customer.objects.aggregate(last=Max('customer_id'))['last'] or 0) + 1
+    first_loan_id = (Loan.objects.aggregate(last=Max('loan_id'))['last'] or 0) + 1
+
+    # A few customers borrow often, most only once or twice
+    rng = chunk_rng(seed, 0, 0)
+    pool = {
+        'ids': np.arange(first_customer_id, first_customer_id + customers),
+        'salaries': np.empty(customers),
+        'cumulative_weight': np.cumsum(rng.gamma(shape=0.8, size=customers)),
+        'on_time_rates': rng.beta(8, 1.5, size=customers),
+    }
+
+    for index, start in enumerate(range(0, customers, chunk_size)):
+        frame = synthetic_customers(chunk_rng(seed, 1, index), first_customer_id + start, min(chunk_size, customers - start))
+        pool['salaries'][start:start + len(frame)] = frame['Monthly Salary'].to_numpy()
+        with transaction.atomic():
+            bulk_load_customers(frame, use_copy=use_copy)
+        if progress:
+            progress('customers', start + len(frame), customers)
+
+    for index, start in enumerate(range(0, loans, chunk_size)):
+        frame = synthetic_loans(chunk_rng(seed, 2, index), first_loan_id + start, min(chunk_size, loans - start), pool, today)
+        with transaction.atomic():
+            bulk_load_loans(frame, use_copy=use_copy)
+        if progress:
+            progress('loans', start + len(frame), loans)
+
+    reset_sequences()
+    rebuild_credit_stats()
+
+    return {
+        'customers': customers,
+        'loans': loans,
+        'first_customer_id': first_customer_id,
+        'first_loan_id': first_loan_id,
+    }
@@ -1,82 +1,307 @@
-from celery import shared_task
+from celery import chord, shared_task
+import logging
 import pandas as pd
 from .models import Customer, Loan
+from collections import Counter
 from datetime import datetime
+from functools import partial
 import os
+import shutil
+import tempfile
+import time
+from django.db import transaction
 from config import settings
+from .ingest import (
+    BULK_LOADERS, DEFAULT_BATCH_SIZE, DEFAULT_CHUNK_SIZE, DEFAULT_SHARD_SIZE, DEFAULT_WORKERS, SOURCE_ID_COLUMNS,
+    bulk_load_customers, bulk_load_loans, reset_sequences, stream_load, write_shards,
+)
+from .progress import ImportProgress
+from .scoring import rebuild_credit_stats, sweep_matured_loans
+
+logger = logging.getLogger(__name__)
 
 BASE_DIR = settings.BASE_DIR
 
-@shared_task
-def load_customer_data():
+DATA_FILES = {
+    'customers': os.path.join(BASE_DIR, 'data', 'customer_data.xlsx'),
+    'loans': os.path.join(BASE_DIR, 'data', 'loan_data.xlsx'),
+}
+
+def import_frame(df, loader, progress, id_column, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Write a loaded sheet chunk by chunk, committing and reporting each chunk to progress"""
+    # Drop repeated ids up front, so a repeat in a later chunk is not counted as already stored
+    unique = df.drop_duplicates(subset=id_column, keep='first')
+    progress.skip('duplicate', len(df) - len(unique))
+    df = unique
+
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        skipped = Counter()
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            created = loader(chunk, skipped=skipped)
+        progress.batch(len(chunk), created, time.perf_counter() - started, skipped)
+
+
+def finish_import(progress, **extra):
+    # Final numbers, logged and returned as the summary
+
+    progress.phase = 'done'
+    summary = {**progress.snapshot(), **extra}
+    summary['message'] = f"Successfully loaded {summary['created']} {summary['kind']}"
+    logger.info("%s (%.0f rows/sec); skipped %s", summary['message'], summary['rows_per_sec'], summary['skipped'])
+    return summary
+
+
+def import_failed(message, exc_info=False):
+    # Returned rather than raised, like the original loaders, so callers can print the message
+
+    logger.error(message, exc_info=exc_info)
+    return message
+
+
+def import_customer_sheet(file_path, task=None, bulk=True, use_copy=False, batch_size=DEFAULT_BATCH_SIZE,
+                          chunk_size=DEFAULT_CHUNK_SIZE):
+    """Load a customer sheet chunk by chunk, returning the import summary"""
+    df = pd.read_excel(file_path, header=0, index_col=None)
+    progress = ImportProgress('customers', total_rows=len(df), task=task)
+
+    if bulk:
+        loader = partial(bulk_load_customers, batch_size=batch_size, use_copy=use_copy)
+    else:
+        loader = load_customer_rows
+
+    import_frame(df, loader, progress, 'Customer ID', chunk_size)
+    return finish_import(progress)
+
+
+def import_loan_sheet(file_path, task=None, bulk=True, use_copy=False, batch_size=DEFAULT_BATCH_SIZE,
+                      chunk_size=DEFAULT_CHUNK_SIZE):
+    """Load a loan sheet chunk by chunk and rebuild credit stats, returning the import summary"""
+    df = pd.read_excel(file_path)
+    progress = ImportProgress('loans', total_rows=len(df), task=task)
+
+    if bulk:
+        loader = partial(bulk_load_loans, batch_size=batch_size, use_copy=use_copy)
+    else:
+        loader = load_loan_rows
+
+    import_frame(df, loader, progress, 'Loan ID', chunk_size)
+
+    # Credit stats are derived from the loan table, so refresh them in bulk
+    progress.set_phase('rebuilding_credit_stats')
+    rebuild_credit_stats()
+
+    return finish_import(progress)
+
+@shared_task(bind=True)
+def load_customer_data(self, bulk=True, use_copy=False, batch_size=DEFAULT_BATCH_SIZE, chunk_size=DEFAULT_CHUNK_SIZE):
     """Load customer data from Excel file with duplicate check"""
-    file_path = os.path.join(BASE_DIR, 'data', 'customer_data.xlsx')
+    file_path = DATA_FILES['customers']
+
+    if not os.path.exists(file_path):
+        return import_failed(f"File not found: {file_path}")
+
+    try:
+        return import_customer_sheet(file_path, self, bulk, use_copy, batch_size, chunk_size)['message']
+
+    except Exception as e:
+        return import_failed(f"Error loading customer data: {str(e)}", exc_info=True)
+
+@shared_task(bind=True)
+def load_loan_data(self, bulk=True, use_copy=False, batch_size=DEFAULT_BATCH_SIZE, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Load loan data from Excel file with duplicate check"""
+    file_path = DATA_FILES['loans']
 
     if not os.path.exists(file_path):
-        return f"File not found: {file_path}"
+        return import_failed(f"File not found: {file_path}")
 
     try:
-        df = pd.read_excel(file_path, header=0, index_col=None)
-        created_count = 0
+        return import_loan_sheet(file_path, self, bulk, use_copy, batch_size, chunk_size)['message']
+
+    except Exception as e:
+        return import_failed(f"Error loading loan data: {str(e)}", exc_info=True)
+
+def load_customer_rows(df, skipped=None):
+    """Load customers one row at a time with get_or_create"""
+    created_count = 0
+
+    for _, row in df.iterrows():
+        customer, created = Customer.objects.get_or_create(
+            customer_id=row['Customer ID'],
+            defaults={
+                'first_name': row['First Name'],
+                'last_name': row['Last Name'],
+                'age': row['Age'],
+                'phone_number': row['Phone Number'],
+                'monthly_salary': row['Monthly Salary'],
+                'approved_limit': row['Approved Limit'],
+                'current_debt': row.get('Current Debt', 0)
+            }
+        )
+        if created:
+            created_count += 1
+        elif skipped is not None:
+            skipped['exists'] += 1
+
+    return created_count
+
+def load_loan_rows(df, skipped=None):
+    """Load loans one row at a time with get_or_create"""
+    created_count = 0
 
-        for _, row in df.iterrows():
-            customer, created = Customer.objects.get_or_create(
-                customer_id=row['Customer ID'],
+    for _, row in df.iterrows():
+        try:
+            customer = Customer.objects.get(customer_id=row['Customer ID'])
+
+            loan, created = Loan.objects.get_or_create(
+                loan_id=row['Loan ID'],
                 defaults={
-                    'first_name': row['First Name'],
-                    'last_name': row['Last Name'],
-                    'age': row['Age'],
-                    'phone_number': row['Phone Number'],
-                    'monthly_salary': row['Monthly Salary'],
-                    'approved_limit': row['Approved Limit'],
-                    'current_debt': row.get('Current Debt', 0)
+                    'customer': customer,
+                    'loan_amount': row['Loan Amount'],
+                    'tenure': row['Tenure'],
+                    'interest_rate': row['Interest Rate'],
+                    'monthly_repayment': row['Monthly payment'],
+                    'emis_paid_on_time': row['EMIs paid on Time'],
+                    'start_date': pd.to_datetime(row['Date of Approval']).date(),
+                    'end_date': pd.to_datetime(row['End Date']).date(),
+                    'is_active': pd.to_datetime(row['End Date']).date() >= datetime.now().date()
                 }
             )
             if created:
                 created_count += 1
+            elif skipped is not None:
+                skipped['exists'] += 1
 
-        return f"Successfully loaded {created_count} customers"
+        except Customer.DoesNotExist:
+            if skipped is not None:
+                skipped['missing_customer'] += 1
 
-    except Exception as e:
-        return f"Error loading customer data: {str(e)}"
+    return created_count
+
+@shared_task(bind=True)
+def stream_load_data(self, kind, file_path=None, chunk_size=DEFAULT_CHUNK_SIZE, workers=DEFAULT_WORKERS,
+                     resume=True, use_copy=False):
+    """Stream a customer or loan file (xlsx, csv or jsonl) into the database in fixed-size chunks"""
+    file_path = file_path or DATA_FILES[kind]
+    progress = ImportProgress(kind, task=self)
+
+    result = stream_load(kind, file_path, chunk_size=chunk_size, workers=workers,
+                         resume=resume, use_copy=use_copy, progress=progress)
+    if kind == 'loans':
+        progress.set_phase('rebuilding_credit_stats')
+        rebuild_credit_stats()
+
+    return finish_import(progress, resumed_from=result['resumed_from'])
 
 @shared_task
-def load_loan_data():
-    """Load loan data from Excel file with duplicate check"""
-    file_path = os.path.join(BASE_DIR, 'data', 'loan_data.xlsx')
+def load_shard(kind, shard_path, start, stop, use_copy=False):
+    """Load one shard file, rows [start, stop) of a customer or loan file, in one transaction"""
+    df = pd.read_csv(shard_path)
+    skipped = Counter()
 
-    if not os.path.exists(file_path):
-        return f"File not found: {file_path}"
+    # Ids already written to an earlier shard were left out when the file was split
+    if stop - start > len(df):
+        skipped['duplicate'] = stop - start - len(df)
+
+    with transaction.atomic():
+        created_count = BULK_LOADERS[kind](df, use_copy=use_copy, skipped=skipped) if len(df) else 0
+
+    return {'kind': kind, 'start': start, 'stop': stop, 'rows': stop - start, 'created': created_count,
+            'skipped': dict(skipped)}
+
+
+def shard_signatures(kind, file_path, shard_dir, shard_size, use_copy):
+    # Split the file into shard files, one load_shard signature each
+
+    return [
+        load_shard.s(kind, shard_path, start, stop, use_copy)
+        for shard_path, start, stop in write_shards(file_path, shard_dir, kind, shard_size, SOURCE_ID_COLUMNS[kind])
+    ]
+
+
+@shared_task(bind=True)
+def sharded_import(self, customer_file=None, loan_file=None, shard_size=DEFAULT_SHARD_SIZE, use_copy=False):
+    """Import customers then loans as shards spread across Celery workers"""
+    customer_file = customer_file or DATA_FILES['customers']
+    loan_file = loan_file or DATA_FILES['loans']
+
+    # Shard files must be readable by every worker, like the source files
+    os.makedirs(settings.IMPORT_SHARD_DIR, exist_ok=True)
+    shard_dir = tempfile.mkdtemp(prefix='import-', dir=settings.IMPORT_SHARD_DIR)
 
     try:
-        df = pd.read_excel(file_path)
-        created_count = 0
-
-        for _, row in df.iterrows():
-            try:
-                customer = Customer.objects.get(customer_id=row['Customer ID'])
-
-                loan, created = Loan.objects.get_or_create(
-                    loan_id=row['Loan ID'],
-                    defaults={
-                        'customer': customer,
-                        'loan_amount': row['Loan Amount'],
-                        'tenure': row['Tenure'],
-                        'interest_rate': row['Interest Rate'],
-                        'monthly_repayment': row['Monthly payment'],
-                        'emis_paid_on_time': row['EMIs paid on Time'],
-                        'start_date': pd.to_datetime(row['Date of Approval']).date(),
-                        'end_date': pd.to_datetime(row['End Date']).date(),
-                        'is_active': pd.to_datetime(row['End Date']).date() >= datetime.now().date()
-                    }
-                )
-                if created:
-                    created_count += 1
-
-            except Customer.DoesNotExist:
-                continue
-
-        return f"Successfully loaded {created_count} loans"
+        customer_shards = shard_signatures('customers', customer_file, shard_dir, shard_size, use_copy)
+    except Exception:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+        raise
 
-    except Exception as e:
-        return f"Error loading loan data: {str(e)}"
+    # Loan shards are only dispatched once every customer shard has committed
+    return self.replace(chord(
+        customer_shards,
+        dispatch_loan_shards.s(loan_file, shard_dir, shard_size, use_copy).on_error(abort_import.s(shard_dir)),
+    ))
+
+
+@shared_task(bind=True)
+def dispatch_loan_shards(self, customer_results, loan_file, shard_dir, shard_size=DEFAULT_SHARD_SIZE, use_copy=False):
+    """Fan out the loan shards after the customer shards complete"""
+    return self.replace(chord(
+        shard_signatures('loans', loan_file, shard_dir, shard_size, use_copy),
+        finalize_import.s(customer_results, shard_dir).on_error(abort_import.s(shard_dir)),
+    ))
+
+
+@shared_task
+def finalize_import(loan_results, customer_results, shard_dir=None):
+    """Reset id sequences, rebuild credit stats and aggregate per-shard counts once all shards are done"""
+    reset_sequences()
+    rebuild_credit_stats()
+
+    if shard_dir:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+
+    summary = {}
+    for result in list(customer_results) + list(loan_results):
+        totals = summary.setdefault(result['kind'], {'shards': 0, 'rows': 0, 'created': 0, 'skipped': Counter()})
+        totals['shards'] += 1
+        totals['rows'] += result['rows']
+        totals['created'] += result['created']
+        totals['skipped'].update(result.get('skipped', {}))
+
+    for totals in summary.values():
+        totals['skipped'] = dict(totals['skipped'])
+
+    return summary
+
+
+@shared_task
+def abort_import(request, exc, traceback, shard_dir=None):
+    """Error callback for the shard chords: a failed shard means finalize_import never runs, so do its cleanup here
+
+    The shards that did commit stay loaded, so the sequences and credit stats still need to cover them.
+    """
+    logger.error("Sharded import failed in task %s: %r", request.id, exc)
+
+    reset_sequences()
+    rebuild_credit_stats()
+
+    if shard_dir:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+
+    return {'phase': 'failed', 'task_id': request.id, 'error': str(exc)}
+
+
+@shared_task
+def deactivate_matured_loans(batch_size=None):
+    """Nightly sweep: flip is_active off for loans past their end date and release their debt"""
+    started = time.perf_counter()
+    result = sweep_matured_loans(batch_size=batch_size or settings.LOAN_SWEEP_BATCH_SIZE)
+    result['seconds'] = round(time.perf_counter() - started, 3)
+
+    logger.info(
+        "Deactivated %(loans)d matured loans in %(batches)d batches "
+        "(%(customers)d customers, %(seconds).3fs)", result,
+    )
+    return result
@@ -1,3 +1,1168 @@
-from django.test import TestCase
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+import json
+import os
+import shutil
+import tempfile
+import threading
+from unittest import skipIf
+from unittest.mock import patch
+import numpy as np
+from asgiref.sync import sync_to_async
+from celery.app.task import Context
+import pandas as pd
+from prometheus_client import REGISTRY
+from rest_framework.renderers import JSONRenderer
+from django.db import connection
+from django.db.models import NOT_PROVIDED
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from .cache import get_or_compute_credit_score
+from .ingest import (
+    SOURCE_ID_COLUMNS, bulk_load_customers, prepare_customers, prepare_loans, stream_load, timestamped, write_chunk,
+    write_shards,
+)
+from .models import Customer, CustomerCreditStats, ImportCheckpoint, Loan
+from .renderers import FastJSONRenderer
+from .routers import PrimaryReplicaRouter, is_sticky, replica_reads, stick_many_to_primary, stick_to_primary
+from .scoring import get_credit_aggregates_bulk, get_credit_stats, rebuild_credit_stats, sweep_matured_loans
+from .serializers import LoanDetailSerializer, LoanListSerializer
+from .synthetic import generate_synthetic_data, synthetic_customers
+from .tasks import (
+    DATA_FILES, abort_import, finalize_import, import_customer_sheet, import_loan_sheet, load_customer_data,
+    load_loan_data, load_shard, sharded_import,
+)
+from .utils import (
+    calculate_approved_limit, calculate_credit_scores, calculate_monthly_installment,
+    calculate_monthly_installment_grid, compute_credit_score,
+)
 
-# Create your tests here.
+
+@override_settings(CREDIT_SCORE_CACHE_ENABLED=False)
+class CreditEvaluationQueryCountTests(TestCase):
+    """The eligibility and loan-creation paths read the customer and their loans only once"""
+
+    def setUp(self):
+        self.customer = Customer.objects.create(
+            first_name='John',
+            last_name='Doe',
+            age=30,
+            phone_number=9876543210,
+            monthly_salary=Decimal('100000'),
+            approved_limit=Decimal('3600000'),
+        )
+        start_date = date.today() - timedelta(days=400)
+        for _ in range(12):
+            Loan.objects.create(
+                customer=self.customer,
+                loan_amount=Decimal('50000'),
+                tenure=24,
+                interest_rate=Decimal('10.00'),
+                monthly_repayment=Decimal('2307.25'),
+                emis_paid_on_time=12,
+                start_date=start_date,
+                end_date=start_date + timedelta(days=720),
+            )
+        rebuild_credit_stats([self.customer.customer_id])
+
+    def loan_request(self):
+        return {
+            'customer_id': self.customer.customer_id,
+            'loan_amount': 100000,
+            'interest_rate': 12.0,
+            'tenure': 12,
+        }
+
+    def test_check_eligibility_query_count(self):
+        # Customer and loan aggregates in one joined stats read
+        with self.assertNumQueries(1):
+            response = self.client.post('/api/check-eligibility/', self.loan_request(), content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['approval'])
+
+    @override_settings(CREDIT_SCORE_CACHE_ENABLED=True)
+    def test_evaluation_skips_score_cache(self):
+        # The stats are already loaded, so the score comes from them without a cache round trip
+        with patch('api.cache.cache') as score_cache:
+            eligibility = self.client.post('/api/check-eligibility/', self.loan_request(), content_type='application/json')
+            loan = self.client.post('/api/create-loan/', self.loan_request(), content_type='application/json')
+
+        self.assertEqual((eligibility.status_code, loan.status_code), (200, 201))
+        score_cache.get_many.assert_not_called()
+        score_cache.get.assert_not_called()
+
+    def test_create_loan_query_count(self):
+        # Stats read, then savepoint, customer row lock, loan insert, customer debt and stats updates, and release
+        with self.assertNumQueries(7):
+            response = self.client.post('/api/create-loan/', self.loan_request(), content_type='application/json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.json()['loan_approved'])
+        self.assertEqual(self.customer.credit_stats.total_loans, 13)
+
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.current_debt, Decimal('700000'))
+        self.assertEqual(self.customer.active_emi_total, Decimal('12') * Decimal('2307.25') + Decimal('8884.88'))
+
+    def test_create_loan_idempotency_key(self):
+        headers = {'HTTP_IDEMPOTENCY_KEY': 'retry-1'}
+        first = self.client.post('/api/create-loan/', self.loan_request(), content_type='application/json', **headers)
+        retry = self.client.post('/api/create-loan/', self.loan_request(), content_type='application/json', **headers)
+
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.customer.loans.count(), 13)
+
+        changed = dict(self.loan_request(), tenure=24)
+        response = self.client.post('/api/create-loan/', changed, content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 422)
+
+    def test_bulk_create_loans(self):
+        # 50000 EMI limit with 27687 already committed: two more 8884.88 installments fit, the third does not
+        unknown = dict(self.loan_request(), customer_id=self.customer.customer_id + 1)
+        loans = [self.loan_request()] * 3 + [unknown]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/create-loans/bulk/', {'loans': loans}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body['approved'], body['rejected']), (2, 2))
+        self.assertEqual([result['message'] for result in body['results']], [
+            "Loan approved successfully",
+            "Loan approved successfully",
+            "Loan not approved due to EMI constraint (>50% of monthly salary)",
+            "Customer not found",
+        ])
+        self.assertEqual(self.customer.loans.count(), 14)
+        self.assertEqual(self.customer.credit_stats.total_loans, 14)
+
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.current_debt, Decimal('800000'))
+        self.assertEqual(self.customer.active_emi_total, Decimal('12') * Decimal('2307.25') + 2 * Decimal('8884.88'))
+
+        # The same number of queries however many loans are in the batch
+        small = [dict(self.loan_request(), loan_amount=1000)] * 20 + [unknown]
+        with self.assertNumQueries(len(queries)):
+            response = self.client.post('/api/create-loans/bulk/', {'loans': small}, content_type='application/json')
+        self.assertEqual(response.json()['approved'], 20)
+
+    def test_bulk_matches_single_loans(self):
+        # Two identical customers with short, fully repaid histories; long new loans drag their scores down
+        def customer():
+            created = Customer.objects.create(
+                first_name='Jane', last_name='Roe', age=35, phone_number=9876543211,
+                monthly_salary=Decimal('1000000'), approved_limit=Decimal('36000000'),
+            )
+            start_date = date.today() - timedelta(days=800)
+            for _ in range(2):
+                Loan.objects.create(
+                    customer=created, loan_amount=Decimal('50000'), tenure=12, interest_rate=Decimal('10.00'),
+                    monthly_repayment=Decimal('4395.79'), emis_paid_on_time=12, is_active=False,
+                    start_date=start_date, end_date=start_date + timedelta(days=360),
+                )
+            rebuild_credit_stats([created.customer_id])
+            return created
+
+        batched, single = customer(), customer()
+        application = {'loan_amount': 100000, 'interest_rate': 10.0, 'tenure': 120}
+
+        response = self.client.post(
+            '/api/create-loans/bulk/',
+            {'loans': [dict(application, customer_id=batched.customer_id)] * 5},
+            content_type='application/json',
+        )
+        results = response.json()['results']
+        for result in results:
+            single_response = self.client.post(
+                '/api/create-loan/', dict(application, customer_id=single.customer_id), content_type='application/json'
+            ).json()
+            self.assertEqual(
+                (result['loan_approved'], result['message'], Decimal(result['monthly_installment'])),
+                (single_response['loan_approved'], single_response['message'],
+                 Decimal(str(single_response['monthly_installment']))),
+            )
+
+        # The fifth loan is priced on a score that includes the four approved before it
+        def rates(owner):
+            return list(owner.loans.filter(tenure=120).order_by('loan_id').values_list('interest_rate', flat=True))
+
+        self.assertEqual(rates(batched), [Decimal('10.00')] * 4 + [Decimal('12.00')])
+        self.assertEqual(rates(batched), rates(single))
+
+    def test_unknown_customer(self):
+        request = dict(self.loan_request(), customer_id=self.customer.customer_id + 1)
+
+        with self.assertNumQueries(2):
+            response = self.client.post('/api/check-eligibility/', request, content_type='application/json')
+
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CREDIT_SCORE_CACHE_ENABLED=False)
+class CreditStatsRebuildTests(TestCase):
+    """Stats rows missing on a read are rebuilt in one transaction, once"""
+
+    def setUp(self):
+        self.customer = Customer.objects.create(
+            first_name='Omar', last_name='Khan', age=52, phone_number=9933344455,
+            monthly_salary=Decimal('120000'), approved_limit=Decimal('4300000'),
+        )
+        start_date = date.today() - timedelta(days=100)
+        Loan.objects.create(
+            customer=self.customer,
+            loan_amount=Decimal('80000'),
+            tenure=12,
+            interest_rate=Decimal('10.00'),
+            monthly_repayment=Decimal('7033.27'),
+            start_date=start_date,
+            end_date=start_date + timedelta(days=360),
+        )
+
+    def stats_writes(self, queries):
+        table = CustomerCreditStats._meta.db_table
+        return [query for query in queries if query['sql'].startswith(f'INSERT INTO "{table}"')]
+
+    def test_rebuild_is_atomic(self):
+        with patch('api.scoring.save_credit_stats', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            get_credit_stats(self.customer.customer_id)
+
+        # The debt columns were recomputed before the failure, and rolled back with it
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.current_debt, 0)
+        self.assertFalse(CustomerCreditStats.objects.exists())
+
+        stats = get_credit_stats(self.customer.customer_id)
+        self.customer.refresh_from_db()
+        self.assertEqual((stats['total_loans'], self.customer.current_debt), (1, Decimal('80000')))
+        self.assertEqual(self.customer.credit_stats.total_loans, 1)
+
+    def test_concurrent_rebuild_is_not_repeated(self):
+        read_aggregates = get_credit_aggregates_bulk
+        raced = []
+
+        def racing(customer_ids, year=None):
+            # Another request builds the rows between this one's read and its lock
+            aggregates = read_aggregates(customer_ids, year)
+            if not raced:
+                raced.append(customer_ids)
+                rebuild_credit_stats(customer_ids)
+            return aggregates
+
+        with patch('api.scoring.get_credit_aggregates_bulk', racing), CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                '/api/credit-scores/batch/', {'customer_ids': [self.customer.customer_id]}, content_type='application/json',
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.stats_writes(queries)), 1)
+
+
+def per_loan_credit_score(customer):
+    # The original loan-by-loan scoring, kept as the reference the aggregate version must match
+
+    loans = list(customer.loans.all())
+    if not loans:
+        return 50
+
+    if sum(loan.loan_amount for loan in loans if loan.is_active) > customer.approved_limit:
+        return 0
+
+    credit_score = 0
+    total_emis = sum(loan.tenure for loan in loans)
+    if total_emis > 0:
+        credit_score += sum(loan.emis_paid_on_time for loan in loans) / total_emis * 40
+
+    credit_score += 20 if len(loans) <= 2 else 15 if len(loans) <= 5 else 10 if len(loans) <= 8 else 5
+
+    current_year_loans = sum(loan.start_date.year == date.today().year for loan in loans)
+    credit_score += 20 if current_year_loans <= 2 else 15 if current_year_loans <= 4 else 10
+
+    total_loan_amount = sum(loan.loan_amount for loan in loans)
+    if total_loan_amount <= customer.approved_limit * Decimal('0.5'):
+        credit_score += 20
+    elif total_loan_amount <= customer.approved_limit:
+        credit_score += 15
+    else:
+        credit_score += 5
+
+    return min(100, max(0, int(credit_score)))
+
+
+@override_settings(CREDIT_SCORE_CACHE_ENABLED=False)
+class CreditScoreEquivalenceTests(TestCase):
+    """Scores from the aggregated stats match the original per-loan algorithm in every bracket"""
+
+    def add_customer(self, loan_count, current_year, volume, all_active=False):
+        customer = Customer.objects.create(
+            first_name='Ravi', last_name='Iyer', age=40, phone_number=9700000000,
+            monthly_salary=Decimal('30000'), approved_limit=Decimal('1000000'),
+        )
+        this_year, earlier = date(date.today().year, 1, 1), date(date.today().year - 3, 6, 1)
+        amount = (customer.approved_limit * volume / loan_count).quantize(Decimal('0.01')) if loan_count else 0
+
+        Loan.objects.bulk_create([
+            Loan(
+                customer=customer,
+                loan_amount=amount,
+                tenure=12,
+                interest_rate=Decimal('12.00'),
+                monthly_repayment=Decimal('1000.00'),
+                emis_paid_on_time=(index * 5) % 13,
+                start_date=this_year if index < current_year else earlier,
+                end_date=date.today() + timedelta(days=365),
+                # Only the first loan is active, so high volume alone does not trip the over-limit zero
+                is_active=all_active or index == 0,
+            )
+            for index in range(loan_count)
+        ])
+        return customer
+
+    def test_matches_per_loan_scores(self):
+        customers = [self.add_customer(0, 0, 0), self.add_customer(3, 0, Decimal('1.5'), all_active=True)]
+        # Both sides of every bracket edge: 2/3, 5/6 and 8/9 loans, 2/3 and 4/5 this year, 50% and 100% volume
+        for loan_count in (1, 2, 3, 5, 6, 8, 9):
+            for current_year in {min(loan_count, count) for count in (0, 2, 3, 4, 5)}:
+                for volume in (Decimal('0.3'), Decimal('0.5'), Decimal('0.8'), Decimal('1'), Decimal('1.5')):
+                    customers.append(self.add_customer(loan_count, current_year, volume))
+        rebuild_credit_stats([customer.customer_id for customer in customers])
+
+        expected = {customer.customer_id: per_loan_credit_score(customer) for customer in customers}
+        self.assertEqual(expected[customers[0].customer_id], 50)
+        self.assertEqual(expected[customers[1].customer_id], 0)
+        self.assertEqual({customer_id: compute_credit_score(customer_id) for customer_id in expected}, expected)
+        self.assertEqual(calculate_credit_scores(list(expected)), expected)
+
+    def test_batch_endpoint_order(self):
+        customers = [self.add_customer(loan_count, 0, Decimal('0.3')) for loan_count in (0, 1, 3, 6, 9)]
+        ids = [customer.customer_id for customer in customers]
+        # Only some customers have stats rows yet, so the rest are rebuilt and scored separately
+        rebuild_credit_stats(ids[::2])
+
+        unknown = ids[-1] + 100
+        requested = [ids[3], unknown, ids[0], ids[1], ids[3], ids[4], ids[2]]
+        response = self.client.post('/api/credit-scores/batch/', {'customer_ids': requested}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'scores': [
+                {'customer_id': customer_id, 'credit_score': per_loan_credit_score(Customer.objects.get(pk=customer_id))}
+                for customer_id in [ids[3], ids[0], ids[1], ids[4], ids[2]]
+            ],
+            'not_found': [unknown],
+        })
+
+
+@override_settings(CREDIT_SCORE_CACHE_ENABLED=False)
+class MaturedLoanSweepTests(TestCase):
+    """The sweep deactivates matured loans in batches and subtracts them from their customers' debt"""
+
+    def setUp(self):
+        self.today = date(2025, 6, 1)
+        self.customers = [
+            Customer.objects.create(
+                first_name=name,
+                last_name='Doe',
+                age=35,
+                phone_number=9000000000 + index,
+                monthly_salary=Decimal('50000'),
+                approved_limit=Decimal('1800000'),
+            )
+            for index, name in enumerate(['Ann', 'Ben', 'Cal'])
+        ]
+        ann, ben, cal = self.customers
+
+        # Ann's three matured loans span both batches of two; her last loan is still running
+        loans = [
+            (ann, '10000', '900.00', date(2025, 1, 1)),
+            (ann, '20000', '1800.00', date(2025, 2, 1)),
+            (ben, '30000', '2700.00', date(2025, 3, 1)),
+            (ann, '40000', '3600.00', date(2025, 4, 1)),
+            (ann, '50000', '4500.00', date(2026, 1, 1)),
+            (cal, '60000', '5400.00', date(2026, 1, 1)),
+        ]
+        self.loans = [
+            Loan.objects.create(
+                customer=customer,
+                loan_amount=Decimal(amount),
+                tenure=12,
+                interest_rate=Decimal('10.00'),
+                monthly_repayment=Decimal(emi),
+                start_date=end_date - timedelta(days=365),
+                end_date=end_date,
+            )
+            for customer, amount, emi, end_date in loans
+        ]
+        rebuild_credit_stats()
+
+    def test_sweep(self):
+        result = sweep_matured_loans(as_of=self.today, batch_size=2)
+
+        self.assertEqual(result, {'loans': 4, 'customers': 2, 'batches': 2})
+        self.assertEqual([loan.is_active for loan in Loan.objects.order_by('loan_id')],
+                         [False, False, False, False, True, True])
+
+        debt = {
+            customer['first_name']: (customer['current_debt'], customer['active_emi_total'])
+            for customer in Customer.objects.values('first_name', 'current_debt', 'active_emi_total')
+        }
+        self.assertEqual(debt, {
+            'Ann': (Decimal('50000'), Decimal('4500.00')),
+            'Ben': (Decimal('0'), Decimal('0')),
+            'Cal': (Decimal('60000'), Decimal('5400.00')),
+        })
+
+        self.assertEqual(sweep_matured_loans(as_of=self.today, batch_size=2), {'loans': 0, 'customers': 0, 'batches': 0})
+
+
+class LoanQuoteTests(TestCase):
+    """The vectorised EMI grid rounds exactly like calculate_monthly_installment"""
+
+    def test_grid_matches_decimal_installments(self):
+        amounts = [Decimal('100.50'), Decimal('1.50'), Decimal('250000'), Decimal('123456.78')]
+        rates = [Decimal('12'), Decimal('0'), Decimal('8.5'), Decimal('24')]
+        tenures = [1, 2, 12, 36]
+
+        grid = calculate_monthly_installment_grid(amounts, rates, tenures)
+
+        # One month at 1% a month is P * 1.01: 101.505 and 1.515 are exact half cents, rounded up
+        self.assertEqual((grid[0, 0, 0], grid[1, 0, 0]), (Decimal('101.51'), Decimal('1.52')))
+        # At 0% the Decimal path returns P / n unrounded
+        self.assertEqual(grid[0, 1, 2], Decimal('100.50') / 12)
+
+        for i, j, k in np.ndindex(grid.shape):
+            self.assertEqual(grid[i, j, k], calculate_monthly_installment(amounts[i], rates[j], tenures[k]))
+
+    def test_quotes(self):
+        customer = Customer.objects.create(
+            first_name='Meera', last_name='Shah', age=33, phone_number=9600000000,
+            monthly_salary=Decimal('60000'), approved_limit=Decimal('2200000'),
+        )
+        request = {
+            'customer_id': customer.customer_id,
+            'loan_amounts': [100000, 200000],
+            'interest_rates': [10, 14],
+            'tenures': [12, 24],
+        }
+
+        response = self.client.post('/api/loan-quotes/', request, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        quotes = response.json()['quotes']
+        self.assertEqual([(quote['loan_amount'], quote['interest_rate'], quote['tenure']) for quote in quotes], [
+            (amount, rate, tenure)
+            for amount in ('100000.00', '200000.00') for rate in ('10.00', '14.00') for tenure in (12, 24)
+        ])
+        # No loan history scores 50, so rates below 12% are corrected up to 12%
+        self.assertEqual(quotes[0], {
+            'loan_amount': '100000.00',
+            'approval': True,
+            'interest_rate': '10.00',
+            'corrected_interest_rate': '12.00',
+            'tenure': 12,
+            'monthly_installment': '8884.88',
+        })
+
+        for change, field in [
+            ({'loan_amounts': []}, 'loan_amounts'),
+            ({'tenures': [0]}, 'tenures'),
+            ({'loan_amounts': list(range(1, 12)), 'interest_rates': list(range(1, 11)), 'tenures': list(range(1, 11))},
+             'non_field_errors'),
+        ]:
+            response = self.client.post('/api/loan-quotes/', dict(request, **change), content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(field, response.json())
+
+        unknown = dict(request, customer_id=customer.customer_id + 1)
+        response = self.client.post('/api/loan-quotes/', unknown, content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+
+class LoanScheduleTests(TestCase):
+    """Schedule pages cover the tenure exactly once and the last instalment pays the loan off"""
+
+    def setUp(self):
+        customer = Customer.objects.create(
+            first_name='Asha', last_name='Rao', age=29, phone_number=9811122233,
+            monthly_salary=Decimal('60000'), approved_limit=Decimal('2200000'),
+        )
+        self.loans = {
+            rate: Loan.objects.create(
+                customer=customer,
+                loan_amount=Decimal(amount),
+                tenure=tenure,
+                interest_rate=Decimal(rate),
+                monthly_repayment=calculate_monthly_installment(Decimal(amount), Decimal(rate), tenure),
+                start_date=date(2024, 1, 31),
+                end_date=date(2025, 7, 31),
+            )
+            for amount, rate, tenure in [('150000', '12.00', 18), ('100000', '0.00', 7)]
+        }
+
+    def get_page(self, loan, offset, limit):
+        response = self.client.get(f'/api/view-loan/{loan.loan_id}/schedule/?offset={offset}&limit={limit}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages(self):
+        loan = self.loans['12.00']
+        pages = [self.get_page(loan, offset, 12) for offset in (0, 12, 24)]
+
+        self.assertEqual([len(page['results']) for page in pages], [12, 6, 0])
+        rows = pages[0]['results'] + pages[1]['results']
+        self.assertEqual(rows, self.get_page(loan, 0, 120)['results'])
+        self.assertEqual([row['installment_number'] for row in rows], list(range(1, 19)))
+        self.assertEqual(rows[0], {
+            'installment_number': 1, 'due_date': '2024-02-29', 'payment': '9147.31',
+            'principal': '7647.31', 'interest': '1500.00', 'balance': '142352.69',
+        })
+
+    def test_payoff_row(self):
+        for loan in self.loans.values():
+            page = self.get_page(loan, 0, 120)
+            rows = page['results']
+
+            self.assertEqual(len(rows), loan.tenure)
+            self.assertEqual(rows[-1]['balance'], '0.00')
+            self.assertEqual(rows[-1]['due_date'], page['payoff_date'])
+            self.assertEqual(sum(Decimal(row['principal']) for row in rows), loan.loan_amount)
+            self.assertTrue(all(Decimal(row['balance']) > 0 for row in rows[:-1]))
+
+    def test_single_loan_query(self):
+        # Only the loan's own columns: no customer join and no deferred-field reloads
+        loan = self.loans['12.00']
+        with CaptureQueriesContext(connection) as queries:
+            self.get_page(loan, 0, 120)
+
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('JOIN', queries[0]['sql'])
+
+    def test_rejects_bad_paging(self):
+        loan = self.loans['12.00']
+        for query in ('limit=0', 'limit=121', 'offset=-1'):
+            response = self.client.get(f'/api/view-loan/{loan.loan_id}/schedule/?{query}')
+            self.assertEqual(response.status_code, 400)
+
+
+class CustomerLoanPagingTests(TestCase):
+    """Keyset pages and streams of a customer's loans cover every active loan exactly once"""
+
+    def setUp(self):
+        customers = [
+            Customer.objects.create(
+                first_name=name, last_name='Shah', age=45, phone_number=9822200000 + index,
+                monthly_salary=Decimal('90000'), approved_limit=Decimal('3200000'),
+            )
+            for index, name in enumerate(['Meera', 'Kabir'])
+        ]
+        self.customer = customers[0]
+
+        # Meera's 26 active loans are interleaved with closed ones and with Kabir's loans
+        Loan.objects.bulk_create([
+            Loan(
+                customer=customers[index % 4 == 3],
+                loan_amount=Decimal('10000') + index,
+                tenure=24,
+                interest_rate=Decimal('9.50'),
+                monthly_repayment=Decimal('459.13'),
+                start_date=date(2024, 1, 1),
+                end_date=date(2026, 1, 1),
+                is_active=index % 4 != 2,
+            )
+            for index in range(50)
+        ])
+        self.active_ids = list(
+            Loan.objects.filter(customer=self.customer, is_active=True).order_by('loan_id').values_list('loan_id', flat=True)
+        )
+        self.assertEqual(len(self.active_ids), 26)
+
+    def get_pages(self, limit):
+        pages = []
+        url = f'/api/view-loans/{self.customer.customer_id}/?limit={limit}'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.json())
+            url = pages[-1]['next']
+        return pages
+
+    def test_cursor_pages(self):
+        everything = self.client.get(f'/api/view-loans/{self.customer.customer_id}/').json()
+
+        # A partial last page (10, 10, 6) and an exact one (13, 13) both end with next null
+        for limit, sizes in [(10, [10, 10, 6]), (13, [13, 13])]:
+            pages = self.get_pages(limit)
+            self.assertEqual([len(page['results']) for page in pages], sizes)
+            self.assertIsNone(pages[-1]['next'])
+
+            results = [loan for page in pages for loan in page['results']]
+            self.assertEqual([loan['loan_id'] for loan in results], self.active_ids)
+            self.assertEqual(results, everything)
+
+        first = self.get_pages(10)[0]
+        self.assertIn(f'cursor={self.active_ids[9]}', first['next'])
+
+    def test_stream(self):
+        everything = self.client.get(f'/api/view-loans/{self.customer.customer_id}/').json()
+
+        response = self.client.get(f'/api/view-loans/{self.customer.customer_id}/?stream=ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), len(self.active_ids))
+        self.assertEqual([json.loads(line) for line in lines], everything)
+
+        response = self.client.get(f'/api/view-loans/{self.customer.customer_id}/?stream=json')
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), everything)
+
+    def test_rejects_bad_paging(self):
+        for query in ('limit=0', 'cursor=-1', 'stream=xml'):
+            response = self.client.get(f'/api/view-loans/{self.customer.customer_id}/?{query}')
+            self.assertEqual(response.status_code, 400)
+
+
+class LoanLoaderQueryCountTests(TestCase):
+    """Loan detail reads join the customer in, so any number of loans costs one query"""
+
+    def setUp(self):
+        customer = Customer.objects.create(
+            first_name='Jane',
+            last_name='Roe',
+            age=41,
+            phone_number=9123456780,
+            monthly_salary=Decimal('80000'),
+            approved_limit=Decimal('2900000'),
+        )
+        start_date = date.today() - timedelta(days=90)
+        self.loan_ids = [
+            Loan.objects.create(
+                customer=customer,
+                loan_amount=Decimal('25000'),
+                tenure=12,
+                interest_rate=Decimal('11.50'),
+                monthly_repayment=Decimal('2215.45'),
+                start_date=start_date,
+                end_date=start_date + timedelta(days=360),
+            ).loan_id
+            for _ in range(5)
+        ]
+
+    def test_view_loan_query_count(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/view-loan/{self.loan_ids[0]}/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['customer']['first_name'], 'Jane')
+
+    def test_batch_query_count(self):
+        ids = ','.join(map(str, self.loan_ids + [self.loan_ids[-1] + 100]))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/loans/?ids={ids}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([loan['loan_id'] for loan in response.json()['loans']], self.loan_ids)
+        self.assertEqual(response.json()['not_found'], [self.loan_ids[-1] + 100])
+
+    def test_batch_rejects_bad_ids(self):
+        response = self.client.get('/api/loans/?ids=1,x')
+        self.assertEqual(response.status_code, 400)
+
+
+class FastLoanOutputTests(TestCase):
+    """The values_list() fast paths and FastJSONRenderer produce the serializers' exact bytes"""
+
+    def setUp(self):
+        self.customer = Customer.objects.create(
+            first_name='Zoë', last_name='O\u2028Neil', age=52, phone_number=9500000000,
+            monthly_salary=Decimal('75000'), approved_limit=Decimal('2700000'),
+        )
+        today = date.today()
+        self.loans = [
+            Loan.objects.create(
+                customer=self.customer,
+                loan_amount=amount,
+                tenure=tenure,
+                interest_rate=rate,
+                monthly_repayment=repayment,
+                start_date=start_date,
+                end_date=start_date + timedelta(days=tenure * 30),
+                is_active=is_active,
+            )
+            for amount, rate, repayment, tenure, start_date, is_active in [
+                (Decimal('100000'), Decimal('9.5'), Decimal('8769.4'), 12, today - timedelta(days=95), True),
+                (Decimal('250000.05'), Decimal('14'), Decimal('12003.67'), 24, today - timedelta(days=800), True),
+                (Decimal('5000'), Decimal('8'), Decimal('434.94'), 12, today - timedelta(days=400), False),
+            ]
+        ]
+
+    def test_view_loan(self):
+        for loan in self.loans:
+            response = self.client.get(f'/api/view-loan/{loan.loan_id}/')
+            self.assertEqual(response.content, JSONRenderer().render(LoanDetailSerializer(loan).data))
+
+    def test_view_customer_loans(self):
+        response = self.client.get(f'/api/view-loans/{self.customer.customer_id}/')
+        expected = LoanListSerializer(self.customer.loans.filter(is_active=True), many=True).data
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+
+    def test_renderer_types(self):
+        data = {
+            'day': date(2025, 3, 1),
+            'at': datetime(2025, 3, 1, 9, 30, 5, 123456, tzinfo=dt_timezone.utc),
+            'time': datetime(2025, 3, 1, 9, 30, 5, 250000).time(),
+            'text': 'Zoë \u2028 \u2029',
+            'values': [1, 2.5, None, True, {'nested': 'ok'}],
+        }
+        for payload in (data, dict(data, amount=Decimal('12.50'))):
+            self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+
+
+@override_settings(CREDIT_SCORE_CACHE_ENABLED=False, SERVER_TIMING_ENABLED=True)
+@override_settings(CREDIT_SCORE_CACHE_ENABLED=False)
+class AsyncEndpointTests(TestCase):
+    """The async endpoints answer exactly as their sync counterparts, errors included"""
+
+    def setUp(self):
+        self.customer = Customer.objects.create(
+            first_name='Nina', last_name='Pillai', age=33, phone_number=9744455566,
+            monthly_salary=Decimal('70000'), approved_limit=Decimal('2500000'),
+        )
+        start_date = date.today() - timedelta(days=200)
+        self.loan_ids = [
+            Loan.objects.create(
+                customer=self.customer,
+                loan_amount=Decimal('40000') + index,
+                tenure=18,
+                interest_rate=Decimal('11.25'),
+                monthly_repayment=Decimal('2432.18'),
+                emis_paid_on_time=6,
+                start_date=start_date,
+                end_date=start_date + timedelta(days=540),
+                is_active=index != 1,
+            ).loan_id
+            for index in range(4)
+        ]
+        rebuild_credit_stats([self.customer.customer_id])
+
+    async def assertMatchesSync(self, method, path, data=None):
+        sync_call = sync_to_async(getattr(self.client, method))
+        async_call = getattr(self.async_client, method)
+
+        if data is None:
+            expected, response = await sync_call(path), await async_call(f'/api/async{path[4:]}')
+        else:
+            body = json.dumps(data)
+            expected = await sync_call(path, body, content_type='application/json')
+            response = await async_call(f'/api/async{path[4:]}', body, content_type='application/json')
+
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.json(), expected.json())
+        return response
+
+    async def test_view_loan(self):
+        response = await self.assertMatchesSync('get', f'/api/view-loan/{self.loan_ids[0]}/')
+        self.assertEqual(response.status_code, 200)
+
+        response = await self.assertMatchesSync('get', f'/api/view-loan/{self.loan_ids[-1] + 1}/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_view_customer_loans(self):
+        response = await self.assertMatchesSync('get', f'/api/view-loans/{self.customer.customer_id}/')
+        self.assertEqual(len(response.json()), 3)
+
+        response = await self.assertMatchesSync('get', f'/api/view-loans/{self.customer.customer_id + 1}/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_check_eligibility(self):
+        request = {'customer_id': self.customer.customer_id, 'loan_amount': 150000, 'interest_rate': 9.5, 'tenure': 24}
+
+        response = await self.assertMatchesSync('post', '/api/check-eligibility/', request)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['approval'])
+
+        for invalid in [dict(request, tenure='twelve'), {'customer_id': self.customer.customer_id}]:
+            response = await self.assertMatchesSync('post', '/api/check-eligibility/', invalid)
+            self.assertEqual(response.status_code, 400)
+
+        response = await self.assertMatchesSync(
+            'post', '/api/check-eligibility/', dict(request, customer_id=self.customer.customer_id + 1),
+        )
+        self.assertEqual(response.status_code, 404)
+
+        response = await self.async_client.post('/api/async/check-eligibility/', '{', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class RequestMetricsTests(TestCase):
+    """Every request reports its SQL and credit-check time in Server-Timing and on /metrics"""
+
+    def test_eligibility_timings(self):
+        customer = Customer.objects.create(
+            first_name='Ada', last_name='Lee', age=35, phone_number=9000000001,
+            monthly_salary=Decimal('60000'), approved_limit=Decimal('2200000'),
+        )
+
+        response = self.client.post('/api/check-eligibility/', {
+            'customer_id': customer.customer_id, 'loan_amount': 100000, 'interest_rate': 12, 'tenure': 12,
+        }, content_type='application/json')
+
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('credit_score;dur=', timing)
+        self.assertIn('emi_constraint;dur=', timing)
+
+        metrics = self.client.get('/metrics').content.decode()
+        self.assertIn('api_request_db_queries_bucket{endpoint="check_eligibility"', metrics)
+        self.assertIn('api_request_stage_duration_seconds_count{endpoint="check_eligibility",stage="credit_score"}', metrics)
+
+    @override_settings(
+        CREDIT_SCORE_CACHE_ENABLED=True,
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    )
+    def test_credit_score_cache_lookups(self):
+        def lookups(result):
+            return REGISTRY.get_sample_value('credit_score_cache_lookups_total', {'result': result}) or 0
+
+        hits, misses = lookups('hit'), lookups('miss')
+        for _ in range(3):
+            self.assertEqual(get_or_compute_credit_score(424242, lambda customer_id: 77), 77)
+
+        self.assertEqual((lookups('hit') - hits, lookups('miss') - misses), (2, 1))
+        self.assertIn('credit_score_cache_lookups_total{result="hit"}', self.client.get('/metrics').content.decode())
+
+
+@override_settings(CREDIT_SCORE_CACHE_ENABLED=False)
+class ImportProgressTests(TestCase):
+    """The Excel loaders account for every row as created or skipped with a reason"""
+
+    def test_loader_summaries(self):
+        customers = import_customer_sheet(DATA_FILES['customers'])
+        self.assertEqual(customers['rows_processed'], customers['rows_total'])
+        self.assertEqual(customers['created'] + sum(customers['skipped'].values()), customers['rows_total'])
+
+        orphan = int(pd.read_excel(DATA_FILES['loans'])['Customer ID'].iloc[0])
+        Customer.objects.filter(customer_id=orphan).delete()
+
+        loans = import_loan_sheet(DATA_FILES['loans'])
+        self.assertEqual(loans['phase'], 'done')
+        self.assertGreater(loans['skipped']['missing_customer'], 0)
+        self.assertEqual(loans['created'] + sum(loans['skipped'].values()), loans['rows_total'])
+        self.assertIsNotNone(loans['batch_commit_ms'])
+
+        # The tasks keep returning the message string
+        self.assertEqual(load_loan_data(), "Successfully loaded 0 loans")
+        self.assertEqual(Loan.objects.count(), loans['created'])
+
+    def test_conflicting_rows_count_as_existing(self):
+        sheet = synthetic_customers(np.random.default_rng(0), 1, 20)
+        bulk_load_customers(sheet.iloc[:5])
+
+        # As if another worker stored the first five rows after this loader checked for them
+        skipped = Counter()
+        with patch('api.ingest.existing_ids', return_value=set()):
+            created = bulk_load_customers(sheet, batch_size=4, skipped=skipped)
+
+        self.assertEqual(created, 15)
+        self.assertEqual(skipped['exists'], 5)
+        self.assertEqual(Customer.objects.count(), 20)
+
+    def test_missing_file(self):
+        with patch.dict(DATA_FILES, customers='/nonexistent/customer_data.xlsx'):
+            result = load_customer_data()
+
+        self.assertEqual(result, "File not found: /nonexistent/customer_data.xlsx")
+
+
+class ShardedImportTests(TestCase):
+    """Each source file is split once into shards that together cover every row exactly once"""
+
+    def setUp(self):
+        self.shard_dir = tempfile.mkdtemp()
+
+    def write_shards(self, kind, shard_size):
+        id_column = SOURCE_ID_COLUMNS[kind]
+        shards = write_shards(DATA_FILES[kind], self.shard_dir, kind, shard_size, id_column)
+        total = len(pd.read_excel(DATA_FILES[kind]))
+        starts = list(range(0, total, shard_size))
+
+        # Full shards end on a shard_size boundary and the last one holds the remainder
+        self.assertEqual([(start, stop) for _, start, stop in shards],
+                         [(start, min(start + shard_size, total)) for start in starts])
+
+        # Every id lands in exactly one shard, the one holding its first occurrence
+        source_ids = pd.read_excel(DATA_FILES[kind])[id_column]
+        shard_ids = pd.concat([pd.read_csv(path)[id_column] for path, _, _ in shards])
+        self.assertEqual(shard_ids.tolist(), source_ids.drop_duplicates().tolist())
+        return shards
+
+    def test_shards_and_totals(self):
+        customer_shards = self.write_shards('customers', 128)
+        loan_shards = self.write_shards('loans', 100)
+        self.assertNotEqual(customer_shards[-1][2] % 128, 0)
+        self.assertNotEqual(loan_shards[-1][2] % 100, 0)
+
+        customer_results = [load_shard('customers', *shard) for shard in customer_shards]
+        loan_results = [load_shard('loans', *shard) for shard in loan_shards]
+        summary = finalize_import(loan_results, customer_results, self.shard_dir)
+
+        self.assertFalse(os.path.exists(self.shard_dir))
+        self.assertEqual(summary['customers']['shards'], len(customer_shards))
+        self.assertEqual(summary['customers']['rows'], customer_shards[-1][2])
+        self.assertEqual(summary['customers']['created'], Customer.objects.count())
+        self.assertEqual(summary['loans']['shards'], len(loan_shards))
+        self.assertEqual(summary['loans']['rows'], loan_shards[-1][2])
+        self.assertEqual(summary['loans']['created'], Loan.objects.count())
+        self.assertEqual(summary['loans']['created'] + sum(summary['loans']['skipped'].values()), loan_shards[-1][2])
+
+    def test_failed_shard_cleans_up(self):
+        customer_results = [load_shard('customers', *shard) for shard in self.write_shards('customers', 128)]
+        loan_shards = self.write_shards('loans', 100)
+        load_shard('loans', *loan_shards[0])
+
+        # The chord error callback runs instead of finalize_import when a later loan shard fails
+        with self.assertLogs('api.tasks', 'ERROR'):
+            failure = abort_import(Context(id='loan-shard-1'), ValueError("bad row"), None, self.shard_dir)
+
+        self.assertEqual(failure, {'phase': 'failed', 'task_id': 'loan-shard-1', 'error': "bad row"})
+        self.assertFalse(os.path.exists(self.shard_dir))
+        self.assertEqual(sum(result['created'] for result in customer_results), Customer.objects.count())
+        self.assertEqual(
+            CustomerCreditStats.objects.filter(total_loans__gt=0).count(),
+            Loan.objects.values('customer_id').distinct().count(),
+        )
+
+    def test_chords_clean_up_on_error(self):
+        with patch('api.tasks.settings.IMPORT_SHARD_DIR', self.shard_dir), \
+                patch.object(sharded_import, 'replace') as replace:
+            sharded_import.run(shard_size=128)
+
+        import_chord = replace.call_args.args[0]
+        shard_dir = import_chord.body.args[1]
+        self.assertEqual(
+            [(callback['task'], tuple(callback['args'])) for callback in import_chord.body.options['link_error']],
+            [(abort_import.name, (shard_dir,))],
+        )
+        shutil.rmtree(self.shard_dir)
+
+
+class StreamLoadResumeTests(TransactionTestCase):
+    """An interrupted stream_load resumes after the contiguous prefix of committed chunks"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.loan_file = os.path.join(directory.name, 'loans.csv')
+
+        customer_file = os.path.join(directory.name, 'customers.csv')
+        synthetic_customers(np.random.default_rng(0), 1, 5).to_csv(customer_file, index=False)
+        stream_load('customers', customer_file, workers=1)
+
+        pd.DataFrame({
+            'Customer ID': [index % 5 + 1 for index in range(100)],
+            'Loan ID': range(1, 101),
+            'Loan Amount': 10000,
+            'Tenure': 12,
+            'Interest Rate': 10.0,
+            'Monthly payment': 879.16,
+            'EMIs paid on Time': 6,
+            'Date of Approval': '2024-01-01',
+            'End Date': '2025-01-01',
+        }).to_csv(self.loan_file, index=False)
+
+    def assertResumes(self, last_row):
+        # Everything before the checkpoint is stored, and a second run loads the rest
+        self.assertEqual(Loan.objects.filter(loan_id__lte=last_row).count(), last_row)
+
+        result = stream_load('loans', self.loan_file, chunk_size=10, workers=3)
+        self.assertEqual(result['resumed_from'], last_row)
+        self.assertEqual(result['rows'], 100 - last_row)
+        self.assertEqual(result['created'] + result['skipped'].get('exists', 0), 100 - last_row)
+        self.assertEqual(Loan.objects.count(), 100)
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_resume_after_failure(self):
+        def interrupted_write(loader, chunk, *args):
+            # Chunks of 10 rows: the fifth fails
+            if int(chunk['Loan ID'].iloc[0]) == 41:
+                raise RuntimeError('interrupted')
+            return write_chunk(loader, chunk, *args)
+
+        with patch('api.ingest.write_chunk', interrupted_write), self.assertRaises(RuntimeError):
+            stream_load('loans', self.loan_file, chunk_size=10, workers=1)
+
+        self.assertEqual(ImportCheckpoint.objects.get().last_row, 40)
+        self.assertResumes(40)
+
+    @skipIf(connection.vendor == 'sqlite', 'SQLite imports write one chunk at a time')
+    def test_checkpoint_skips_open_chunks(self):
+        three_committed, failed = threading.Event(), threading.Event()
+
+        class CommittedChunks:
+            total_rows = 100
+            count = 0
+
+            def batch(self, *args):
+                self.count += 1
+                if self.count == 3:
+                    three_committed.set()
+
+        def interrupted_write(loader, chunk, *args):
+            # Chunks of 10 rows: the fifth fails once three other chunks are recorded, and the
+            # second, held open until then, is lost with it as if the process had died
+            index = (int(chunk['Loan ID'].iloc[0]) - 1) // 10
+            if index == 1:
+                failed.wait(timeout=10)
+                raise RuntimeError('interrupted')
+            if index == 4:
+                three_committed.wait(timeout=10)
+                failed.set()
+                raise RuntimeError('interrupted')
+            return write_chunk(loader, chunk, *args)
+
+        with patch('api.ingest.write_chunk', interrupted_write), self.assertRaises(RuntimeError):
+            stream_load('loans', self.loan_file, chunk_size=10, workers=3, progress=CommittedChunks())
+
+        # Later chunks committed, but the checkpoint cannot pass the second chunk, which never did
+        last_row = ImportCheckpoint.objects.get().last_row
+        self.assertLessEqual(last_row, 10)
+        self.assertResumes(last_row)
+
+
+class CopyColumnsTests(SimpleTestCase):
+    """COPY writes only the frame's columns, so the prepared sheets must cover every required column"""
+
+    def assertCopiesRequiredColumns(self, model, frame):
+        copied = {model._meta.get_field(name).column for name in timestamped(frame).columns}
+        required = {
+            field.column for field in model._meta.concrete_fields
+            if not field.null and field.db_default is NOT_PROVIDED
+        }
+        self.assertEqual(required - copied, set())
+
+    def test_customer_columns(self):
+        sheet = pd.read_excel(DATA_FILES['customers'], nrows=5)
+        self.assertCopiesRequiredColumns(Customer, prepare_customers(sheet))
+
+    def test_loan_columns(self):
+        sheet = pd.read_excel(DATA_FILES['loans'], nrows=5)
+        self.assertCopiesRequiredColumns(Loan, prepare_loans(sheet))
+
+
+class CustomerRegistrationTests(TestCase):
+    """Bulk registration inserts a batch with one INSERT and matches single registration limits"""
+
+    def registration(self, index, monthly_income):
+        return {
+            'first_name': 'Asha',
+            'last_name': f'Rao {index}',
+            'age': 28,
+            'monthly_income': monthly_income,
+            'phone_number': 9800000000 + index,
+        }
+
+    def test_bulk_register(self):
+        # 12500 * 36 is exactly 4.5 lakh, so it must round half up like calculate_approved_limit
+        incomes = ['12500.00', '12499.99', '50000', '138888.89'] * 22
+        customers = [self.registration(index, income) for index, income in enumerate(incomes)]
+
+        # Savepoint, one INSERT ... RETURNING (88 rows stay under SQLite's 999 parameters), release
+        with self.assertNumQueries(3):
+            response = self.client.post('/api/register/bulk/', {'customers': customers}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(body['created'], 88)
+        self.assertEqual([customer['approved_limit'] for customer in body['customers'][:4]],
+                         ['500000.00', '400000.00', '1800000.00', '5000000.00'])
+
+        ids = [customer['customer_id'] for customer in body['customers']]
+        stored = dict(Customer.objects.filter(customer_id__in=ids).values_list('customer_id', 'approved_limit'))
+        self.assertEqual([stored[customer_id] for customer_id in ids],
+                         [calculate_approved_limit(Decimal(income)) for income in incomes])
+
+    def test_bulk_register_rejects_invalid_batch(self):
+        customers = [self.registration(0, '50000'), dict(self.registration(1, '50000'), age=12)]
+        response = self.client.post('/api/register/bulk/', {'customers': customers}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Customer.objects.exists())
+
+
+@override_settings(CREDIT_SCORE_CACHE_ENABLED=False)
+class SyntheticDataTests(TestCase):
+    """Generated data is reproducible from its seed and ready for the credit checks"""
+
+    def test_seeded_generation(self):
+        generate_synthetic_data(500, customers=50, seed=3, chunk_size=200)
+        first = list(Loan.objects.order_by('loan_id').values_list('customer_id', 'loan_amount', 'tenure', 'emis_paid_on_time'))
+
+        Loan.objects.all().delete()
+        Customer.objects.all().delete()
+        generate_synthetic_data(500, customers=50, seed=3, chunk_size=200)
+        second = list(Loan.objects.order_by('loan_id').values_list('customer_id', 'loan_amount', 'tenure', 'emis_paid_on_time'))
+
+        self.assertEqual(len(first), 500)
+        self.assertEqual([row[1:] for row in first], [row[1:] for row in second])
+        self.assertTrue(all(row[3] <= row[2] for row in first))
+
+        busiest = Customer.objects.filter(loans__is_active=True).first()
+        self.assertGreater(busiest.current_debt, 0)
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica_1'],
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    """Reads go to a replica only inside replica_reads() and never for a customer who just wrote"""
+
+    router = PrimaryReplicaRouter()
+
+    def test_reads_default_to_primary(self):
+        self.assertEqual(self.router.db_for_read(Loan), 'default')
+
+    def test_replica_reads(self):
+        with replica_reads(1):
+            self.assertEqual(self.router.db_for_read(Loan), 'replica_1')
+            self.assertEqual(self.router.db_for_write(Loan), 'default')
+        self.assertEqual(self.router.db_for_read(Loan), 'default')
+
+    def test_sticky_after_write(self):
+        stick_to_primary(2)
+        with replica_reads(2):
+            self.assertEqual(self.router.db_for_read(Loan), 'default')
+        with replica_reads(3):
+            self.assertEqual(self.router.db_for_read(Loan), 'replica_1')
+
+    def test_cache_outage_logged_once(self):
+        with patch('api.routers._sticky_cache_down', False), patch('api.routers.cache') as sticky_cache, \
+                self.assertLogs('api.routers', 'WARNING') as logs:
+            sticky_cache.get.side_effect = sticky_cache.set.side_effect = ConnectionError("redis down")
+            for customer_id in range(3):
+                stick_to_primary(customer_id)
+                with replica_reads(customer_id):
+                    self.assertEqual(self.router.db_for_read(Loan), 'default')
+
+            # Logged again only after the cache has recovered and failed anew
+            sticky_cache.set.side_effect = None
+            stick_to_primary(4)
+            is_sticky(5)
+
+        self.assertEqual(len(logs.records), 2)
+        self.assertTrue(all(record.exc_info is None for record in logs.records))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_cache_without_replicas(self):
+        with patch('api.routers.cache') as sticky_cache:
+            stick_to_primary(1)
+            stick_many_to_primary([1, 2])
+            with replica_reads(1):
+                self.assertEqual(self.router.db_for_read(Loan), 'default')
+
+        self.assertEqual(sticky_cache.mock_calls, [])
+
+    def test_no_migrations_on_replicas(self):
+        self.assertFalse(self.router.allow_migrate('replica_1', 'api'))
+        self.assertTrue(self.router.allow_migrate('default', 'api'))
@@ -1,12 +1,25 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('register/', views.register_customer, name='register'),
+    path('register/bulk/', views.register_customers_bulk, name='register_bulk'),
     path('check-eligibility/', views.check_loan_eligibility, name='check_eligibility'),
     path('create-loan/', views.create_loan, name='create_loan'),
+    path('create-loans/bulk/', views.create_loans_bulk, name='create_loans_bulk'),
+    path('loans/', views.view_loans, name='view_loans'),
     path('view-loan/<int:loan_id>/', views.view_loan, name='view_loan'),
+    path('view-loan/<int:loan_id>/schedule/', views.view_loan_schedule, name='view_loan_schedule'),
     path('view-loans/<int:customer_id>/', views.view_customer_loans, name='view_customer_loans'),
+    path('loan-quotes/', views.loan_quotes, name='loan_quotes'),
+    path('credit-scores/batch/', views.batch_credit_scores, name='batch_credit_scores'),
+    path('admin/portfolio-export/', views.export_portfolio, name='export_portfolio'),
+    path('admin/tasks/<str:task_id>/', views.task_status, name='task_status'),
+
+    # Async versions of the read and eligibility endpoints, for ASGI deployments
+    path('async/check-eligibility/', async_views.check_loan_eligibility, name='async_check_eligibility'),
+    path('async/view-loan/<int:loan_id>/', async_views.view_loan, name='async_view_loan'),
+    path('async/view-loans/<int:customer_id>/', async_views.view_customer_loans, name='async_view_customer_loans'),
 
     # path('load-data/', views.load_data, name='load_data'),        # OPTIONAL ENDPOINT FOR LOADING EXCEL DATA
 
@@ -1,6 +1,10 @@
-from decimal import Decimal, ROUND_HALF_UP
+import numpy as np
 from datetime import datetime
-from .models import Customer, Loan
+from decimal import Decimal, ROUND_HALF_UP
+from .cache import get_or_compute_credit_score
+from .metrics import note_customer, stage, timed
+from .models import Customer
+from .scoring import DEBT_FIELDS, aget_credit_stats, get_credit_stats, get_credit_stats_bulk, score_from_aggregates
 
 
 def calculate_approved_limit(monthly_salary):
@@ -11,71 +15,43 @@ def calculate_approved_limit(monthly_salary):
     return (limit / 100000).quantize(Decimal('1'), rounding=ROUND_HALF_UP) * 100000  # Round off
 
 
-def calculate_credit_score(customer_id):
-    # Calculate credit score based on historical data
-
-    try:
-        customer = Customer.objects.get(customer_id=customer_id)
-        loans = Loan.objects.filter(customer=customer)
+LAKH_PAISE = 100000 * 100
 
-        if not loans.exists():
-            return 50  # Default score for new customers
 
-        # Check if sum of current loans > approved limit
+def approved_limits(monthly_salaries):
+    """calculate_approved_limit for many salaries at once, as a NumPy array of whole rupees"""
+    # Integer paise keep the arithmetic exact; round half away from zero, like ROUND_HALF_UP
 
-        current_loans = loans.filter(is_active=True)
-        current_debt = sum(loan.loan_amount for loan in current_loans)
-        if current_debt > customer.approved_limit:
-            return 0
+    limits = np.rint(np.asarray(monthly_salaries, dtype=float) * 100).astype('int64') * 36
+    lakhs = np.sign(limits) * ((np.abs(limits) + LAKH_PAISE // 2) // LAKH_PAISE)
 
-        credit_score = 0
-        total_loans = loans.count()
+    return lakhs * 100000
 
-        # Component 1: Past loans paid on time (40% weight)
 
-        total_emis = sum(loan.tenure for loan in loans)
-        total_paid_on_time = sum(loan.emis_paid_on_time for loan in loans)
-        if total_emis > 0:
-            on_time_ratio = total_paid_on_time / total_emis
-            credit_score += on_time_ratio * 40
+@timed('credit_score')
+def calculate_credit_score(customer_id):
+    # Calculate credit score based on historical data (cached per loan version)
 
-        # Component 2: Number of loans taken (20% weight)
+    return get_or_compute_credit_score(customer_id, compute_credit_score)
 
-        if total_loans <= 2:
-            credit_score += 20
-        elif total_loans <= 5:
-            credit_score += 15
-        elif total_loans <= 8:
-            credit_score += 10
-        else:
-            credit_score += 5
 
-        # Component 3: Loan activity in current year (20% weight)
+def compute_credit_score(customer_id):
+    # Calculate credit score from the precomputed stats row, bypassing the cache
 
-        current_year_loans = loans.filter(start_date__year=datetime.now().year)
+    stats = get_credit_stats(customer_id)
 
-        if current_year_loans.count() <= 2:
-            credit_score += 20
-        elif current_year_loans.count() <= 4:
-            credit_score += 15
-        else:
-            credit_score += 10
-
-        # Component 4: Loan approved volume (20% weight)
+    if stats is None:
+        return 0
 
-        total_loan_amount = sum(loan.loan_amount for loan in loans)
+    return score_from_aggregates(stats)
 
-        if total_loan_amount <= customer.approved_limit * Decimal('0.5'):
-            credit_score += 20
-        elif total_loan_amount <= customer.approved_limit:
-            credit_score += 15
-        else:
-            credit_score += 5
 
-        return min(100, max(0, int(credit_score)))
+@timed('credit_score')
+def calculate_credit_scores(customer_ids):
+    # Calculate credit scores for many customers, keyed by customer_id (missing customers are omitted)
 
-    except Customer.DoesNotExist:
-        return 0
+    stats = get_credit_stats_bulk(customer_ids)
+    return {customer_id: score_from_aggregates(row) for customer_id, row in stats.items()}
 
 
 def calculate_monthly_installment(loan_amount, interest_rate, tenure):
@@ -95,6 +71,37 @@ def calculate_monthly_installment(loan_amount, interest_rate, tenure):
     return emi.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
 
+def calculate_monthly_installment_grid(loan_amounts, interest_rates, tenures):
+    # Vectorised EMI for every (amount, rate, tenure) combination, as an array of Decimals
+    # shaped (len(loan_amounts), len(interest_rates), len(tenures))
+
+    principal = np.array([float(amount) for amount in loan_amounts])[:, None, None]
+    rate = np.array([float(rate) for rate in interest_rates])[None, :, None] / 100 / 12
+    n = np.array([float(tenure) for tenure in tenures])[None, None, :]
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        power = (1 + rate) ** n
+        cents = principal * rate * power / (power - 1) * 100
+
+    # Float error can only change ROUND_HALF_UP right at a half cent, so those cells (and the
+    # zero-rate ones, which the Decimal path leaves unrounded) are recomputed exactly
+    fraction = cents - np.floor(cents)
+    tolerance = np.abs(cents) * 1e-11 + 1e-9
+    exact = (np.abs(fraction - 0.5) < tolerance) | (rate == 0) | ~np.isfinite(cents)
+
+    rounded = np.floor(cents + 0.5)
+    result = np.empty(cents.shape, dtype=object)
+
+    for index in np.ndindex(cents.shape):
+        i, j, k = index
+        if exact[index]:
+            result[index] = calculate_monthly_installment(loan_amounts[i], interest_rates[j], tenures[k])
+        else:
+            result[index] = Decimal(int(rounded[index])).scaleb(-2)
+
+    return result
+
+
 def get_interest_rate_by_credit_score(credit_score, requested_rate):
     # Determine appropriate interest rate based on credit score
 
@@ -108,13 +115,143 @@ def get_interest_rate_by_credit_score(credit_score, requested_rate):
         return None  # Loan not approved
 
 
+@timed('emi_constraint')
 def check_emi_constraint(customer_id, additional_emi=0):
     # Check if total EMIs exceed 50% of monthly salary
 
-    try:
-        customer = Customer.objects.get(customer_id=customer_id)
-        current_loans = Loan.objects.filter(customer=customer, is_active=True)
-        total_emi = sum(loan.monthly_repayment for loan in current_loans) + additional_emi
-        return total_emi <= customer.monthly_salary * Decimal('0.5')
-    except Customer.DoesNotExist:
+    stats = get_credit_stats(customer_id)
+
+    if stats is None:
         return False
+
+    total_emi = (stats['active_emi_amount'] or 0) + additional_emi
+    return total_emi <= stats['monthly_salary'] * Decimal('0.5')
+
+
+class CreditEvaluation:
+    """A customer's stats and credit score, loaded once and shared by every step of a request"""
+
+    def __init__(self, customer_id, stats):
+        note_customer(customer_id)
+        self.customer_id = customer_id
+        self.stats = stats
+        self._credit_score = None
+
+    @classmethod
+    @timed('credit_score')
+    def load(cls, customer_id):
+        # One query for the customer and their loan aggregates; None if the customer does not exist
+
+        stats = get_credit_stats(customer_id)
+        return cls(customer_id, stats) if stats is not None else None
+
+    @classmethod
+    @timed('credit_score')
+    def load_many(cls, customer_ids):
+        # Evaluations keyed by customer_id, from one stats query per BULK_CHUNK_SIZE customers (missing
+        # customers are omitted)
+
+        return {
+            customer_id: cls(customer_id, stats)
+            for customer_id, stats in get_credit_stats_bulk(customer_ids).items()
+        }
+
+    @classmethod
+    async def aload(cls, customer_id):
+        with stage('credit_score'):
+            stats = await aget_credit_stats(customer_id)
+        return cls(customer_id, stats) if stats is not None else None
+
+    @property
+    @timed('credit_score')
+    def credit_score(self):
+        # Scored straight from the stats already loaded; a cache round trip would cost more than it saves
+
+        if self._credit_score is None:
+            self._credit_score = score_from_aggregates(self.stats)
+        return self._credit_score
+
+    def interest_rate(self, requested_rate):
+        return get_interest_rate_by_credit_score(self.credit_score, requested_rate)
+
+    def lock_customer(self):
+        # Lock the customer row until the end of the transaction and refresh the debt columns from it,
+        # so concurrent loans for the same customer are checked one after another
+
+        locked = (
+            Customer.objects.select_for_update()
+            .filter(customer_id=self.customer_id)
+            .values('monthly_salary', *DEBT_FIELDS.values())
+            .get()
+        )
+        self.refresh_debt(locked)
+
+    @staticmethod
+    def lock_customers(evaluations):
+        # lock_customer for a dict of evaluations in one query. Rows are locked in customer_id order,
+        # so two batches sharing customers wait for each other instead of deadlocking.
+
+        locked_rows = (
+            Customer.objects.select_for_update()
+            .filter(customer_id__in=list(evaluations))
+            .order_by('customer_id')
+            .values('customer_id', 'monthly_salary', *DEBT_FIELDS.values())
+        )
+        for locked in locked_rows:
+            evaluations[locked['customer_id']].refresh_debt(locked)
+
+    def refresh_debt(self, locked):
+        self.stats['monthly_salary'] = locked['monthly_salary']
+        self.stats.update({name: locked[column] for name, column in DEBT_FIELDS.items()})
+
+    def add_loan(self, loan):
+        # Fold a loan approved earlier in the same batch into the stats the way record_loan does, so the
+        # next application is scored and limit-checked as if this one had already been committed
+
+        stats = self.stats
+        stats['total_loans'] += 1
+        stats['total_tenure'] = (stats['total_tenure'] or 0) + loan.tenure
+        stats['emis_paid_on_time'] = (stats['emis_paid_on_time'] or 0) + loan.emis_paid_on_time
+        stats['total_loan_amount'] = (stats['total_loan_amount'] or 0) + loan.loan_amount
+        stats['current_year_loans'] += loan.start_date.year == datetime.now().year
+        if loan.is_active:
+            stats['active_loan_amount'] = (stats['active_loan_amount'] or 0) + loan.loan_amount
+            stats['active_emi_amount'] = (stats['active_emi_amount'] or 0) + loan.monthly_repayment
+        self._credit_score = None
+
+    def within_approved_limit(self):
+        # Existing active debt must not exceed the approved limit (a zero score otherwise)
+
+        return (self.stats['active_loan_amount'] or 0) <= self.stats['approved_limit']
+
+    @timed('emi_constraint')
+    def within_emi_limit(self, additional_emi=0):
+        # Same rule as check_emi_constraint, without re-reading the customer
+
+        total_emi = (self.stats['active_emi_amount'] or 0) + additional_emi
+        return total_emi <= self.stats['monthly_salary'] * Decimal('0.5')
+
+    def eligibility(self, loan_amount, interest_rate, tenure):
+        # Approval, corrected rate and installment for one eligibility request
+
+        corrected_rate = self.interest_rate(interest_rate)
+
+        if corrected_rate is None or self.credit_score <= 10:
+            approval = False
+            corrected_rate = interest_rate
+        else:
+            approval = True
+
+        monthly_installment = calculate_monthly_installment(loan_amount, corrected_rate, tenure)
+
+        if approval and not self.within_emi_limit(monthly_installment):
+            approval = False
+
+        return {
+            'customer_id': self.customer_id,
+            'approval': approval,
+            'interest_rate': float(interest_rate),
+            'corrected_interest_rate': float(corrected_rate),
+            'tenure': tenure,
+            'monthly_installment': float(monthly_installment)
+        }
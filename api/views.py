@@ -1,10 +1,27 @@
 from rest_framework import status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.response import Response
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from functools import partial
+from config.celery import app as celery_app
+from .amortisation import add_months, schedule_page
+from .idempotency import idempotent
+from .origination import APPROVED, EMI_CONSTRAINT, LOW_CREDIT_SCORE, loan_end_date, originate_loans
+from .progress import PROGRESS_STATE
+from .registration import register_customers
+from .queries import get_loan_detail_row, get_loan_detail_rows
+from .renderers import FastJSONRenderer
+from .routers import pinned, replica_reads, stick_to_primary
 from .serializers import *
+from .scoring import record_loan
+from .streaming import STREAM_CHUNK_SIZE, streaming_response
 from .utils import *
-from datetime import datetime, timedelta
+from datetime import date, datetime
 
 # from .tasks import load_customer_data, load_loan_data
 
@@ -26,12 +43,30 @@ def register_customer(request):
             monthly_salary=monthly_salary,
             approved_limit=approved_limit,
         )
+        stick_to_primary(customer.customer_id)
 
         response_serializer = CustomerRegistrationResponseSerializer(customer)
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+@idempotent
+def register_customers_bulk(request):
+    """Register up to MAX_CUSTOMERS customers in one transaction"""
+    serializer = BulkCustomerRegistrationSerializer(data=request.data)
+
+    if serializer.is_valid():
+        customers = register_customers(serializer.validated_data['customers'])
+
+        response_serializer = BulkCustomerRegistrationResponseSerializer({
+            'created': len(customers),
+            'customers': customers,
+        })
+        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
 @api_view(['POST'])
 def check_loan_eligibility(request):
     """Check loan eligibility for a customer"""
@@ -43,41 +78,15 @@ def check_loan_eligibility(request):
         interest_rate = serializer.validated_data['interest_rate']
         tenure = serializer.validated_data['tenure']
 
-        try:
-            customer = Customer.objects.get(customer_id=customer_id)
-        except Customer.DoesNotExist:
+        # Load the customer and their loan aggregates once for the whole request
+        with replica_reads(customer_id):
+            evaluation = CreditEvaluation.load(customer_id)
+        if evaluation is None:
             return Response({'error': 'Customer not found'},
                           status=status.HTTP_404_NOT_FOUND)
 
-        # Calculate credit score
-        credit_score = calculate_credit_score(customer_id)
-
-        # Determine approval and corrected interest rate
-        corrected_rate = get_interest_rate_by_credit_score(credit_score, interest_rate)
-
-        if corrected_rate is None or credit_score <= 10:
-            approval = False
-            corrected_rate = interest_rate
-        else:
-            approval = True
-
-        # Calculate monthly installment
-        monthly_installment = calculate_monthly_installment(
-            loan_amount, corrected_rate, tenure
-        )
-
-        # Check EMI constraint
-        if approval and not check_emi_constraint(customer_id, monthly_installment):
-            approval = False
-
-        response_data = {
-            'customer_id': customer_id,
-            'approval': approval,
-            'interest_rate': float(interest_rate),
-            'corrected_interest_rate': float(corrected_rate),
-            'tenure': tenure,
-            'monthly_installment': float(monthly_installment)
-        }
+        # Score, correct the rate and check the EMI constraint against the loaded stats
+        response_data = evaluation.eligibility(loan_amount, interest_rate, tenure)
 
         response_serializer = LoanEligibilityResponseSerializer(data=response_data)
         if response_serializer.is_valid():
@@ -86,6 +95,7 @@ def check_loan_eligibility(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@idempotent
 def create_loan(request):
     """Create a new loan"""
     serializer = LoanCreateSerializer(data=request.data)
@@ -96,15 +106,14 @@ def create_loan(request):
         interest_rate = serializer.validated_data['interest_rate']
         tenure = serializer.validated_data['tenure']
 
-        try:
-            customer = Customer.objects.get(customer_id=customer_id)
-        except Customer.DoesNotExist:
+        evaluation = CreditEvaluation.load(customer_id)
+        if evaluation is None:
             return Response({'error': 'Customer not found'},
                           status=status.HTTP_404_NOT_FOUND)
 
         # Check eligibility
-        credit_score = calculate_credit_score(customer_id)
-        corrected_rate = get_interest_rate_by_credit_score(credit_score, interest_rate)
+        credit_score = evaluation.credit_score
+        corrected_rate = evaluation.interest_rate(interest_rate)
 
         monthly_installment = calculate_monthly_installment(
             loan_amount, corrected_rate or interest_rate, tenure
@@ -115,27 +124,38 @@ def create_loan(request):
         message = ""
 
         if corrected_rate is None or credit_score <= 10:
-            message = "Loan not approved due to low credit score"
-        elif not check_emi_constraint(customer_id, monthly_installment):
-            message = "Loan not approved due to EMI constraint (>50% of monthly salary)"
+            message = LOW_CREDIT_SCORE
+        elif not evaluation.within_emi_limit(monthly_installment):
+            message = EMI_CONSTRAINT
         else:
             # Create the loan
             start_date = datetime.now().date()
-            end_date = start_date + timedelta(days=tenure * 30)  # Approximate
-
-            loan = Loan.objects.create(
-                customer=customer,
-                loan_amount=loan_amount,
-                tenure=tenure,
-                interest_rate=corrected_rate,
-                monthly_repayment=monthly_installment,
-                start_date=start_date,
-                end_date=end_date,
-            )
-
-            loan_approved = True
-            loan_id = loan.loan_id
-            message = "Loan approved successfully"
+            end_date = loan_end_date(start_date, tenure)
+
+            # Scoring ran above without locks; only the re-check and the writes hold the customer row
+            with transaction.atomic():
+                evaluation.lock_customer()
+
+                if not evaluation.within_approved_limit():
+                    message = LOW_CREDIT_SCORE
+                elif not evaluation.within_emi_limit(monthly_installment):
+                    message = EMI_CONSTRAINT
+                else:
+                    loan = Loan.objects.create(
+                        customer_id=customer_id,
+                        loan_amount=loan_amount,
+                        tenure=tenure,
+                        interest_rate=corrected_rate,
+                        monthly_repayment=monthly_installment,
+                        start_date=start_date,
+                        end_date=end_date,
+                    )
+                    record_loan(loan)
+                    transaction.on_commit(partial(stick_to_primary, customer_id))
+
+                    loan_approved = True
+                    loan_id = loan.loan_id
+                    message = APPROVED
 
         response_data = {
             'loan_id': loan_id,
@@ -151,24 +171,223 @@ def create_loan(request):
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+@idempotent
+def create_loans_bulk(request):
+    """Create up to MAX_LOANS loans in one transaction, with a result per loan"""
+    serializer = BulkLoanCreateSerializer(data=request.data)
+
+    if serializer.is_valid():
+        results = originate_loans(serializer.validated_data['loans'])
+        approved = sum(result['loan_approved'] for result in results)
+
+        response_serializer = BulkLoanCreateResponseSerializer({
+            'approved': approved,
+            'rejected': len(results) - approved,
+            'results': results,
+        })
+        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['POST'])
+def loan_quotes(request):
+    """Quote every combination of loan amount, interest rate and tenure for a customer"""
+    serializer = LoanQuoteSerializer(data=request.data)
+
+    if serializer.is_valid():
+        customer_id = serializer.validated_data['customer_id']
+        loan_amounts = serializer.validated_data['loan_amounts']
+        interest_rates = serializer.validated_data['interest_rates']
+        tenures = serializer.validated_data['tenures']
+
+        evaluation = CreditEvaluation.load(customer_id)
+        if evaluation is None:
+            return Response({'error': 'Customer not found'},
+                          status=status.HTTP_404_NOT_FOUND)
+
+        # One score for the whole grid; the corrected rate only depends on the requested rate
+        credit_score = evaluation.credit_score
+        corrected_rates = []
+        rate_approvals = []
+
+        for interest_rate in interest_rates:
+            corrected_rate = evaluation.interest_rate(interest_rate)
+            approved = corrected_rate is not None and credit_score > 10
+            corrected_rates.append(corrected_rate if approved else interest_rate)
+            rate_approvals.append(approved)
+
+        installments = calculate_monthly_installment_grid(loan_amounts, corrected_rates, tenures)
+
+        quotes = []
+        for i, loan_amount in enumerate(loan_amounts):
+            for j, interest_rate in enumerate(interest_rates):
+                for k, tenure in enumerate(tenures):
+                    monthly_installment = installments[i, j, k]
+                    quotes.append({
+                        'loan_amount': loan_amount,
+                        'approval': rate_approvals[j] and evaluation.within_emi_limit(monthly_installment),
+                        'interest_rate': interest_rate,
+                        'corrected_interest_rate': corrected_rates[j],
+                        'tenure': tenure,
+                        'monthly_installment': monthly_installment,
+                    })
+
+        response_serializer = LoanQuoteResponseSerializer({'customer_id': customer_id, 'quotes': quotes})
+        return Response(response_serializer.data, status=status.HTTP_200_OK)
+
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['POST'])
+def batch_credit_scores(request):
+    """Compute credit scores for a batch of customers"""
+    serializer = CreditScoreBatchSerializer(data=request.data)
+
+    if serializer.is_valid():
+        # Scores follow the request order, each id once; unknown ids are listed in not_found
+        customer_ids = list(dict.fromkeys(serializer.validated_data['customer_ids']))
+        scores = calculate_credit_scores(customer_ids)
+
+        response_data = {
+            'scores': [
+                {'customer_id': customer_id, 'credit_score': scores[customer_id]}
+                for customer_id in customer_ids if customer_id in scores
+            ],
+            'not_found': [customer_id for customer_id in customer_ids if customer_id not in scores],
+        }
+
+        response_serializer = CreditScoreBatchResponseSerializer(response_data)
+        return Response(response_serializer.data, status=status.HTTP_200_OK)
+
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
 @api_view(['GET'])
+@renderer_classes([FastJSONRenderer, BrowsableAPIRenderer])
 def view_loan(request, loan_id):
     """View specific loan details"""
-    loan = get_object_or_404(Loan, loan_id=loan_id)
-    serializer = LoanDetailSerializer(loan)
+    row = get_loan_detail_row(loan_id)
+    if row is None:
+        raise Http404('No Loan matches the given query.')
+
+    return Response(loan_detail_data(row, date.today()), status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@renderer_classes([FastJSONRenderer, BrowsableAPIRenderer])
+def view_loans(request):
+    """View many loans at once (?ids=1,2,3) in a constant number of queries"""
+    query = LoanBatchQuerySerializer(data=request.query_params)
+    if not query.is_valid():
+        return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    loan_ids = list(dict.fromkeys(query.validated_data['ids']))
+    rows = get_loan_detail_rows(loan_ids)
+    today = date.today()
+
+    response_data = {
+        'loans': [loan_detail_data(rows[loan_id], today) for loan_id in loan_ids if loan_id in rows],
+        'not_found': [loan_id for loan_id in loan_ids if loan_id not in rows],
+    }
+    return Response(response_data, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+def view_loan_schedule(request, loan_id):
+    """View one page of a loan's amortisation schedule"""
+    query = ScheduleQuerySerializer(data=request.query_params)
+    if not query.is_valid():
+        return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    loan = get_object_or_404(
+        Loan.objects.only('loan_id', 'loan_amount', 'interest_rate', 'tenure', 'start_date'), loan_id=loan_id
+    )
+    offset = query.validated_data['offset']
+    limit = query.validated_data['limit']
+
+    response_data = {
+        'loan_id': loan.loan_id,
+        'monthly_installment': calculate_monthly_installment(loan.loan_amount, loan.interest_rate, loan.tenure),
+        'tenure': loan.tenure,
+        'payoff_date': add_months(loan.start_date, loan.tenure),
+        'offset': offset,
+        'limit': limit,
+        'results': schedule_page(loan, offset, limit),
+    }
+
+    serializer = LoanScheduleSerializer(response_data)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 @api_view(['GET'])
+@renderer_classes([FastJSONRenderer, BrowsableAPIRenderer])
 def view_customer_loans(request, customer_id):
-    """View all loans for a customer"""
-    try:
-        customer = Customer.objects.get(customer_id=customer_id)
-        loans = Loan.objects.filter(customer=customer, is_active=True)
-        serializer = LoanListSerializer(loans, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-    except Customer.DoesNotExist:
-        return Response({'error': 'Customer not found'},
-                       status=status.HTTP_404_NOT_FOUND)
+    """View all loans for a customer, optionally a page at a time (?cursor=&limit=) or streamed (?stream=)"""
+    query = LoanPageQuerySerializer(data=request.query_params)
+    if not query.is_valid():
+        return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    with replica_reads(customer_id):
+        if not Customer.objects.filter(customer_id=customer_id).exists():
+            return Response({'error': 'Customer not found'},
+                           status=status.HTTP_404_NOT_FOUND)
+
+        loans = Loan.objects.filter(customer_id=customer_id, is_active=True).values_list(*LOAN_LIST_FIELDS)
+        today = date.today()
+
+        # Streamed rows are read in chunks after this block exits, so pin the database now
+        if 'stream' in query.validated_data:
+            rows = pinned(loans.order_by('loan_id')).iterator(chunk_size=STREAM_CHUNK_SIZE)
+            return streaming_response((loan_list_row(row, today) for row in rows), query.validated_data['stream'])
+
+        # Keyset pagination: each page starts after the last loan_id of the previous one
+        if 'cursor' in request.query_params or 'limit' in request.query_params:
+            limit = query.validated_data['limit']
+            rows = list(loans.filter(loan_id__gt=query.validated_data.get('cursor', 0)).order_by('loan_id')[:limit + 1])
+
+            next_url = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_url = replace_query_param(request.build_absolute_uri(), 'cursor', rows[-1][0])
+
+            return Response({'next': next_url, 'results': loan_list_data(rows, today)}, status=status.HTTP_200_OK)
+
+        return Response(loan_list_data(loans, today), status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_portfolio(request):
+    """Stream every loan, or only active/inactive ones (?active=), as NDJSON or a JSON array (?stream=)"""
+    query = PortfolioExportQuerySerializer(data=request.query_params)
+    if not query.is_valid():
+        return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    loans = Loan.objects.order_by('loan_id').values_list(*LOAN_EXPORT_FIELDS)
+    if query.validated_data['active'] is not None:
+        loans = loans.filter(is_active=query.validated_data['active'])
+
+    with replica_reads():
+        loans = pinned(loans)
+
+    today = date.today()
+    rows = loans.iterator(chunk_size=STREAM_CHUNK_SIZE)
+    return streaming_response(
+        (loan_export_row(row, today) for row in rows),
+        query.validated_data['stream'],
+        filename=f'portfolio-{today.isoformat()}',
+    )
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def task_status(request, task_id):
+    """State of a background task: progress while a data import runs, then its result or error"""
+    result = celery_app.AsyncResult(task_id)
+    data = {'task_id': task_id, 'state': result.state}
+
+    if result.state == PROGRESS_STATE:
+        data['progress'] = result.info
+    elif result.successful():
+        data['result'] = result.result
+    elif result.failed():
+        data['error'] = str(result.result)
+
+    return Response(data, status=status.HTTP_200_OK)
 
 # @api_view(['POST'])                                               # MANUAL API ENDPOINT FOR LOADING CUST + LOAN DATA
 # def load_data(request):                                           # CURRENTLY AUTO LOAD ON DOCKER BUILD
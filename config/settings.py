@@ -11,7 +11,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from celery.schedules import crontab
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -49,6 +50,7 @@ THIRD_PARTY_APPS = [
 INSTALLED_APPS = DJANGO_APPS + LOCAL_APPS + THIRD_PARTY_APPS
 
 MIDDLEWARE = [
+    "api.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -81,16 +83,68 @@ WSGI_APPLICATION = "config.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.postgresql",
-        "NAME": config("NAME"),
-        "USER": config("USER"),
-        "PASSWORD": config("PASSWORD"),
-        "HOST": config("HOST"),
-        "PORT": config("PORT", default = "5432"),
+DB_ENGINE = config("DB_ENGINE", default="postgresql")
+
+if DB_ENGINE == "sqlite3":
+    # For local runs and benchmarks without a PostgreSQL server; NAME is the database file
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": config("NAME", default=str(BASE_DIR / "db.sqlite3")),
+            "OPTIONS": {"timeout": 30, "transaction_mode": "IMMEDIATE"},
+        }
     }
-}
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": config("NAME"),
+            "USER": config("USER"),
+            "PASSWORD": config("PASSWORD"),
+            "HOST": config("HOST"),
+            "PORT": config("PORT", default = "5432"),
+        }
+    }
+
+# Connection reuse. DB_POOL_ENABLED keeps a psycopg 3 pool in every web and Celery worker process,
+# sized by DB_POOL_MIN_SIZE/DB_POOL_MAX_SIZE; otherwise each thread keeps its connection open for
+# DB_CONN_MAX_AGE seconds and checks it is still alive before reusing it.
+if config("DB_POOL_ENABLED", default=False, cast=bool) and DB_ENGINE == "postgresql":
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": config("DB_POOL_MIN_SIZE", default=2, cast=int),
+            "max_size": config("DB_POOL_MAX_SIZE", default=10, cast=int),
+            "timeout": config("DB_POOL_TIMEOUT", default=10, cast=int),
+        },
+    }
+else:
+    DATABASES["default"]["CONN_MAX_AGE"] = config("DB_CONN_MAX_AGE", default=60, cast=int)
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+
+# Read replicas share the primary's credentials; list them as host or host:port in REPLICA_HOSTS,
+# or with DB_ENGINE=sqlite3 as database files in REPLICA_NAMES.
+# Only views that opt in with api.routers.replica_reads() read from them.
+if DB_ENGINE == "sqlite3":
+    REPLICAS = [{"NAME": name} for name in config("REPLICA_NAMES", default="", cast=Csv())]
+else:
+    REPLICAS = []
+    for replica in config("REPLICA_HOSTS", default="", cast=Csv()):
+        host, _, port = replica.partition(":")
+        REPLICAS.append({"HOST": host, "PORT": port or DATABASES["default"].get("PORT")})
+
+DATABASE_REPLICAS = []
+for index, replica in enumerate(REPLICAS, start=1):
+    DATABASES[f"replica_{index}"] = {
+        **DATABASES["default"],
+        **replica,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica_{index}")
+
+DATABASE_ROUTERS = ["api.routers.PrimaryReplicaRouter"]
+
+# After a write, that customer's reads stay on the primary for this long to hide replication lag
+REPLICA_STICKY_SECONDS = config("REPLICA_STICKY_SECONDS", default=5, cast=int)
 
 # Celery Configuration
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
@@ -99,6 +153,37 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+CELERY_TASK_TRACK_STARTED = True  # report STARTED before a loader's first PROGRESS update
+
+# Sharded imports split the source files here; it must be shared by every worker, like the data files
+IMPORT_SHARD_DIR = config('IMPORT_SHARD_DIR', default=str(BASE_DIR / 'data' / 'shards'))
+
+# Deactivate matured loans once a night, in batches of LOAN_SWEEP_BATCH_SIZE rows
+LOAN_SWEEP_BATCH_SIZE = config('LOAN_SWEEP_BATCH_SIZE', default=5000, cast=int)
+CELERY_BEAT_SCHEDULE = {
+    'deactivate-matured-loans': {
+        'task': 'api.tasks.deactivate_matured_loans',
+        'schedule': crontab(hour=config('LOAN_SWEEP_HOUR', default=0, cast=int), minute=15),
+    },
+}
+
+# Cache (credit scores are cached in Redis, invalidated on loan writes)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('CACHE_URL', default='redis://localhost:6379/1'),
+    }
+}
+CREDIT_SCORE_CACHE_ENABLED = config('CREDIT_SCORE_CACHE_ENABLED', default=True, cast=bool)
+CREDIT_SCORE_CACHE_TTL = config('CREDIT_SCORE_CACHE_TTL', default=3600, cast=int)
+
+# Request metrics are served at /metrics. Server-Timing headers reveal internal timings, so they
+# are on only in DEBUG unless enabled; requests slower than SLOW_REQUEST_MS are logged with their customer.
+SERVER_TIMING_ENABLED = config('SERVER_TIMING_ENABLED', default=DEBUG, cast=bool)
+SLOW_REQUEST_MS = config('SLOW_REQUEST_MS', default=500, cast=int)
+
+# Stored responses for Idempotency-Key retries are replayed for this many seconds
+IDEMPOTENCY_KEY_TTL = config('IDEMPOTENCY_KEY_TTL', default=86400, cast=int)
 
 # REST Framework
 # REST_FRAMEWORK = {
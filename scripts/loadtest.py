@@ -0,0 +1,111 @@
+"""Fire concurrent GET requests at the API and report throughput and latency percentiles.
+
+Compare connect-per-request with pooled connections by starting the server twice:
+
+    DB_CONN_MAX_AGE=0 python manage.py runserver        # new connection per request
+    DB_POOL_ENABLED=True python manage.py runserver     # psycopg pool
+    python scripts/loadtest.py "http://localhost:8000/api/view-loan/{id}/" --ids 1-500 --label pooled
+"""
+import argparse
+import http.client
+import json
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile of an already sorted list
+
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def parse_ids(value):
+    start, _, stop = value.partition('-')
+    return range(int(start), int(stop or start) + 1)
+
+
+class Worker(threading.local):
+    # One keep-alive HTTP connection per thread, so we time the server rather than TCP setup
+
+    connection = None
+
+    def get(self, url):
+        parts = urlsplit(url)
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+
+        path = parts.path + (f'?{parts.query}' if parts.query else '')
+        try:
+            self.connection.request('GET', path)
+            response = self.connection.getresponse()
+            response.read()
+            return response.status
+        except (http.client.HTTPException, OSError):
+            self.connection.close()
+            self.connection = None
+            raise
+
+
+def run(urls, requests, concurrency, ids=None, warmup=20):
+    worker = Worker()
+    rng = random.Random(0)
+    targets = [rng.choice(urls).replace('{id}', str(rng.choice(ids)) if ids else '') for _ in range(requests)]
+
+    def timed(url):
+        started = time.perf_counter()
+        try:
+            status = worker.get(url)
+        except (http.client.HTTPException, OSError):
+            status = None
+        return (time.perf_counter() - started) * 1000, status
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, targets[:warmup]))
+
+        started = time.perf_counter()
+        results = list(executor.map(timed, targets))
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    errors = sum(1 for _, status in results if status is None or status >= 500)
+
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'rps': round(requests / elapsed, 1),
+        'mean_ms': round(statistics.fmean(latencies), 2),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('urls', nargs='+', help='URLs to GET; {id} is replaced with a random id from --ids')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--ids', type=parse_ids, default=None, help='Id range for {id}, e.g. 1-500')
+    parser.add_argument('--label', default='', help='Name for this run in the output')
+    parser.add_argument('--json', action='store_true', help='Print one JSON object instead of a table row')
+    args = parser.parse_args()
+
+    result = run(args.urls, args.requests, args.concurrency, ids=args.ids)
+    result = {'label': args.label, **result}
+
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print('  '.join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,43 +4,26 @@ import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 django.setup()
 
+from api import ingest
 from api.tasks import load_customer_data, load_loan_data
-from django.db import connection
 
 
 def reset_sequences():
     """Fix auto-increment sequences after data loading"""
     print("\n🔧 Resetting sequences...")
 
-    with connection.cursor() as cursor:
-        # Reset customer sequence
-        cursor.execute("""
-            SELECT setval(
-                pg_get_serial_sequence('customer', 'customer_id'),
-                COALESCE((SELECT MAX(customer_id) FROM customer), 0) + 1,
-                false
-            );
-        """)
-
-        # Reset loan sequence
-        cursor.execute("""
-            SELECT setval(
-                pg_get_serial_sequence('loan', 'loan_id'),
-                COALESCE((SELECT MAX(loan_id) FROM loan), 0) + 1,
-                false
-            );
-        """)
+    ingest.reset_sequences()
 
     print("✅ Sequences reset successfully!")
 
 
 if __name__ == '__main__':
     print("Loading customer data...")
-    result1 = load_customer_data()
+    result1 = load_customer_data(use_copy=True)
     print(result1)
 
     print("Loading loan data...")
-    result2 = load_loan_data()
+    result2 = load_loan_data(use_copy=True)
     print(result2)
 
     # Fix sequences after loading